@@ -1,19 +1,28 @@
 ﻿# -*- coding: utf-8 -*-
+import time
+STARTUP_T0 = time.perf_counter()  # Taken before the other imports so they count towards startup
+
 import os
 import sys
-import openpyxl
-import requests
-import pygame
+import argparse
 import tkinter as tk
 from tkinter import ttk, messagebox
-from urllib.parse import quote
 import threading
-
-def resource_path(relative_path):
-    """Get path relative to exe or script folder"""
-    if hasattr(sys, "_MEIPASS"):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.abspath("."), relative_path)
+from concurrent.futures import ThreadPoolExecutor
+from levels import LEVELS, resource_path, audio_store_dir, drill_log_path, level_excel_path
+from level_store import LevelStore
+from audio_downloader import BulkDownloader, audio_filename
+from async_downloader import AsyncDownloadEngine
+from audio_manifest import is_cached
+from word_grid import VirtualWordGrid
+from word_index import WordIndex
+from vocab_watch import SpreadsheetWatcher, changed_ranges, diff_words, remap_index, summarize
+from drill_scheduler import DrillScheduler, GRADE_AGAIN, GRADE_HARD, GRADE_GOOD, GRADE_EASY
+from audio_prefetch import AudioPrefetcher
+from audio_cache import SoundCache
+from audio_stream import stream_and_play
+from ui_events import UIEventChannel
+from instrumentation import metrics, metrics_path, start_profiler
 
 class RussianVocabularyApp:
     def __init__(self, root):
@@ -21,6 +30,11 @@ class RussianVocabularyApp:
         self.root.title("Russian Vocabulary")
         self.root.geometry("865x600")
         
+        # Initialize the pygame mixer off the critical path; playback waits for it
+        self.mixer_ready = threading.Event()
+        threading.Thread(target=self.init_mixer, name="mixer-init", daemon=True).start()
+        self.startup_budget_ms = 1000  # Target time-to-first-paint
+        
         # Initialize variables
         self.use_proxy = tk.BooleanVar(value=True)
         self.proxy_url = tk.StringVar(value="http://127.0.0.1:7890")
@@ -28,10 +42,51 @@ class RussianVocabularyApp:
         self.current_selection = 0
         self.current_image = None
         self.level_var = tk.StringVar(value="A1")  # Default level
+        self.search_var = tk.StringVar()
+        self.search_all_levels = tk.BooleanVar(value=False)
+        self.search_hits = None  # (level, index) of each shown word while filtering
         self.current_columns = 6  # Default columns
         
+        # Spaced-repetition drill over every level
+        self.drill_cards = None  # Current card first, then the ones pre-staged after it; None outside drill mode
+        self.drill_revealed = False
+        self.drill_stage = 4  # Upcoming cards whose audio is fetched and decoded ahead
+        self.drill_new_per_day = 20
+        self.drill_job = None
+        
+        # Worker threads report to Tk only through this channel
+        self.ui_events = UIEventChannel(self.root, self.status_var.set, interval_ms=50)
+        self.resize_debounce_ms = 100  # Coalesce bursts of <Configure> events
+        self.resize_job = None
+        self.last_relayout_ms = None  # Duration of the most recent column re-layout
+        
+        # Bulk download settings
+        self.download_workers = 8
+        self.download_rate = 10.0  # Requests per second per host
+        self.download_retries = 4
+        self.tts_backends = {"ru": "google", "en": "google"}  # TTS provider per language
+        self.downloader = BulkDownloader(
+            workers=self.download_workers,
+            rate=self.download_rate,
+            retries=self.download_retries,
+            backends=self.tts_backends
+        )
+        # Level-bound, cancellable downloads; playback and prefetch jump ahead of bulk jobs.
+        # Started on the first download so its thread and HTTP session stay off the startup path
+        self.download_engine = None
+        self.download_engine_lock = threading.Lock()
+        self.bulk_job = None
+        
+        # Decoded sounds kept in memory for instant replay
+        self.sound_cache_budget = 64 * 1024 * 1024  # Bytes of decoded PCM
+        self.sound_cache = SoundCache(self.sound_cache_budget, ready=self.mixer_ready)
+        
+        # Fetch and decode audio for the grid neighbours of the selection in the background
+        self.prefetcher = AudioPrefetcher(self.fetch_audio, workers=2,
+                                          on_ready=self.sound_cache.warm)
+        
         # Level data
-        self.levels = ["A1", "A2", "B1", "B2", "C1", "C2"]
+        self.levels = list(LEVELS)
         self.level_words = {
             "A1": [
                 ("привет", "Hello"), ("пока", "Goodbye"), ("спасибо", "Thank you"),
@@ -62,44 +117,76 @@ class RussianVocabularyApp:
             ]
         }
         
-        # Initialize pygame mixer
-        pygame.mixer.init()
-        
         # Load data
+        self.words = []
+        
+        # Search index over every loaded level, built off the UI thread
+        self.word_index = WordIndex(self.levels)
+        self.index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="word-index")
+        
+        # Pick up edits to the current level's spreadsheet while the app runs
+        self.sheet_watcher = SpreadsheetWatcher(self.root, self.get_excel_path, self.on_sheet_changed,
+                                                interval_ms=1000)
         self.setup_directories()
-        self.load_level_data(self.level_var.get())
         
         # Create UI
         self.create_widgets()
+        self.ui_events.start()
         
         # Bind keyboard events
         self.bind_keyboard_events()
         
+        # Paint the window first; the level's words are loaded right after
+        self.status_var.set(f"Loading level {self.level_var.get()}...")
+        self.root.after_idle(self.finish_startup)
+        
+    def init_mixer(self):
+        """Import pygame and open the audio device on a background thread"""
+        try:
+            with metrics.span("startup.mixer_init"):
+                import pygame
+                pygame.mixer.init()
+        except Exception as e:
+            print(f"Mixer init failed: {e}")
+        finally:
+            self.mixer_ready.set()
+        
+    def finish_startup(self):
+        """Runs once the first frame is drawn: load the default level"""
+        self.root.update_idletasks()
+        first_paint = time.perf_counter() - STARTUP_T0
+        metrics.record("startup.first_paint", first_paint)
+        if first_paint * 1000 > self.startup_budget_ms:
+            print(f"Time to first paint {first_paint * 1000:.0f} ms exceeds budget of {self.startup_budget_ms} ms")
+        
+        self.load_level_data(self.level_var.get())
+        
         # Refresh word list to show columns on startup
         self.refresh_word_list()
+        self.sheet_watcher.start()
+        self.update_status("Ready")
+        metrics.record("startup.ready", time.perf_counter() - STARTUP_T0)
+        print(f"Startup: first paint {first_paint * 1000:.0f} ms, "
+              f"ready {(time.perf_counter() - STARTUP_T0) * 1000:.0f} ms")
+        
+        # Once the window is up, load the neighbouring levels in the background
+        self.preload_adjacent_levels()
         
     def setup_directories(self):
-        """Setup directories for all levels"""
+        """Setup the words directory; level folders are created on first use"""
         self.base_dir = resource_path("")
         self.words_dir = resource_path("words")
         os.makedirs(self.words_dir, exist_ok=True)
         
-        # Create subdirectories for each level
-        for level in self.levels:
-            level_dir = os.path.join(self.words_dir, f"word_{level}")
-            os.makedirs(level_dir, exist_ok=True)
-            
-            # Create audio subdirectory for each level
-            audio_dir = os.path.join(level_dir, "audio_files")
-            os.makedirs(audio_dir, exist_ok=True)
-            
-            # Create Excel file if it doesn't exist
-            excel_path = os.path.join(level_dir, f"word_{level}.xlsx")
-            if not os.path.exists(excel_path):
-                self.create_level_excel(level, excel_path)
+        # Loaded levels stay in memory; the spreadsheet is only reparsed when it changes
+        self.level_store = LevelStore(self.words_dir, self.levels, create_excel=self.create_level_excel,
+                                      on_load=self.on_level_loaded)
+        self.drill_scheduler = DrillScheduler(drill_log_path(self.words_dir), new_per_day=self.drill_new_per_day)
         
     def create_level_excel(self, level, path):
         """Create Excel file for specific level"""
+        import openpyxl  # Deferred: only needed for levels without a spreadsheet
+        
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = "Words"
@@ -116,145 +203,376 @@ class RussianVocabularyApp:
         wb.save(path)
         print(f"Created Excel file for level {level}: {path}")
         
+    @metrics.timed("load_level_data")
     def load_level_data(self, level):
         """Load data for specific level"""
-        level_dir = os.path.join(self.words_dir, f"word_{level}")
-        excel_path = os.path.join(level_dir, f"word_{level}.xlsx")
-        
-        if not os.path.exists(excel_path):
-            self.create_level_excel(level, excel_path)
-            
-        self.wb = openpyxl.load_workbook(excel_path)
-        self.sheet = self.wb.active
-        
-        # Load words into memory
-        self.words = []
-        for row in self.sheet.iter_rows(min_row=2):
-            russian = row[0].value
-            english = row[1].value
-            if russian and english:
-                self.words.append((russian, english))
+        # Served from memory if visited or preloaded, else from the compiled cache
+        self.words = self.level_store.get(level)
                 
         print(f"Loaded {len(self.words)} words for level {level}")
         self.current_selection = 0  # Reset selection when level changes
         
+    def on_level_loaded(self, level, words):
+        """Index a freshly loaded level; runs on whichever thread loaded it"""
+        self.index_executor.submit(self.index_level, level, words)
+        self.drill_scheduler.add_level(level, words)
+        
+    def index_level(self, level, words):
+        with metrics.span("word_index.add_level", level=level):
+            self.word_index.add_level(level, words)
+        self.ui_events.call(self.on_index_updated)
+        
+    def on_index_updated(self):
+        if self.search_var.get().strip():
+            self.apply_search()
+        
+    def on_search_changed(self, *args):
+        """Filter the word list as the user types"""
+        if self.drill_cards is not None and self.search_var.get().strip():
+            self.stop_drill()
+        self.apply_search()
+        
+    def on_search_scope_changed(self):
+        if self.search_all_levels.get():
+            self.level_store.preload(self.levels)
+        self.apply_search()
+        
+    def apply_search(self):
+        """Show only the words matching the search box, or the whole level when it is empty"""
+        query = self.search_var.get()
+        if not query.strip():
+            if self.search_hits is not None:
+                self.clear_search_results()
+            return
+        
+        levels = None if self.search_all_levels.get() else [self.level_var.get()]
+        with metrics.span("search", chars=len(query)):
+            hits = self.word_index.search(query, levels)
+        self.search_hits = hits
+        self.words = [self.word_index.word(level, index) for level, index in hits]
+        self.refresh_word_list()
+        if not self.word_index.has_level(self.level_var.get()):
+            self.update_status(f"Indexing level {self.level_var.get()}...")
+        else:
+            self.update_status(f"{len(hits)} match(es) for '{query.strip()}'")
+        
+    def clear_search_results(self):
+        """Return to the full level, keeping the selected word if it belongs to it"""
+        level = self.level_var.get()
+        selected = None
+        if self.search_hits and 0 <= self.current_selection < len(self.search_hits):
+            selected = self.search_hits[self.current_selection]
+        self.search_hits = None
+        self.words = self.level_store.get(level)
+        self.refresh_word_list()
+        if selected is not None and selected[0] == level:
+            self.current_selection = selected[1]
+            self.update_selection()
+            self.word_grid.see(self.current_selection)
+        self.update_status(f"Level {level}: {len(self.words)} words")
+        
+    def on_search_escape(self, event):
+        self.search_var.set("")
+        self.root.focus_set()
+        return "break"
+        
+    def focus_search(self, event):
+        if not isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            self.search_entry.focus_set()
+            return "break"
+        
+    def on_nav_key(self, event, direction):
+        """h/j/k/l navigation, except while typing in an entry"""
+        if not isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            self.move_selection(direction)
+        
     def get_proxy(self):
         """Get proxy configuration if enabled"""
         if self.use_proxy.get() and self.proxy_url.get().strip():
             return self.proxy_url.get().strip()
         return None
         
-    def get_audio_dir(self):
-        """Get audio directory for current level"""
+    def get_excel_path(self):
+        return level_excel_path(self.words_dir, self.level_var.get())
+        
+    def on_sheet_changed(self, path):
+        """Reload an edited spreadsheet off the UI thread and diff it against the shown words"""
         level = self.level_var.get()
-        level_dir = os.path.join(self.words_dir, f"word_{level}")
-        return os.path.join(level_dir, "audio_files")
+        # While filtering or drilling the grid is not the level; it is reloaded when that ends
+        old_words = self.words if self.search_hits is None and self.drill_cards is None else None
+        self.update_status(f"Level {level} spreadsheet changed, reloading...")
+        
+        def reload_thread():
+            try:
+                new_words = self.level_store.get(level)
+            except Exception as e:
+                self.update_status(f"Cannot reload level {level}: {e}")
+                return
+            opcodes = diff_words(old_words, new_words) if old_words is not None else None
+            self.ui_events.call(self.apply_word_changes, level, old_words, new_words, opcodes)
+        
+        threading.Thread(target=reload_thread, name="sheet-reload", daemon=True).start()
+        
+    def apply_word_changes(self, level, old_words, new_words, opcodes):
+        """Patch the shown words with the rows that changed, keeping the selected word"""
+        if (level != self.level_var.get() or old_words is None or old_words is not self.words
+                or self.drill_cards is not None):
+            # Switched level, filtering or drilling meanwhile; the search re-runs once the
+            # level is reindexed and leaving the drill reloads the level
+            return
+        self.words = new_words
+        if not opcodes:
+            return
+        selection = remap_index(opcodes, self.current_selection)
+        self.current_selection = max(0, min(selection, len(new_words) - 1))
+        with metrics.span("apply_word_changes", ops=len(opcodes)):
+            self.word_grid.update_words(new_words, changed_ranges(opcodes))
+            self.update_selection()
+        added, removed, changed = summarize(opcodes)
+        self.update_status(f"Level {level} updated: {added} added, {removed} removed, {changed} changed")
         
-    def download_audio(self, text, language):
-        """Download audio file"""
-        safe_text = "".join(c if c.isalnum() else "_" for c in text)
-        audio_dir = self.get_audio_dir()
-        filename = os.path.join(audio_dir, f"{language}_{safe_text}.mp3")
+    def get_audio_dir(self):
+        """Get the audio directory; every level shares one store"""
+        return audio_store_dir(self.words_dir)
         
-        if os.path.exists(filename):
-            return filename
-            
-        try:
-            encoded_text = quote(text)
-            if language == "ru":
-                url = f"https://translate.google.com/translate_tts?ie=UTF-8&tl=ru&client=tw-ob&q={encoded_text}"
-            else:
-                url = f"https://translate.google.com/translate_tts?ie=UTF-8&tl=en&client=tw-ob&q={encoded_text}"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Referer': 'https://translate.google.com/'
-            }
-            
-            # Proxy configuration
-            proxy = self.get_proxy()
-            proxies = None
-            if proxy:
-                proxies = {
-                    'http': proxy,
-                    'https': proxy
-                }
-            
-            self.update_status(f"Downloading {language} audio: {text}")
-            response = requests.get(url, headers=headers, timeout=30, proxies=proxies)
-            
-            if response.status_code == 200:
-                with open(filename, 'wb') as f:
-                    f.write(response.content)
-                return filename
-            else:
-                self.update_status(f"Download failed: {text} (Status: {response.status_code})")
-                
-        except Exception as e:
-            self.update_status(f"Download failed: {e}")
+    def preload_adjacent_levels(self):
+        """Load the levels next to the current one on a background thread"""
+        self.level_store.preload(self.level_store.neighbours(self.level_var.get()))
         
-        return None
+    def get_download_engine(self):
+        """The download engine, started on first use; safe to call from any thread"""
+        with self.download_engine_lock:
+            if self.download_engine is None:
+                with metrics.span("download_engine.start"):
+                    self.download_engine = AsyncDownloadEngine(self.downloader, concurrency=self.download_workers)
+            return self.download_engine
+        
+    def fetch_audio(self, text, language, filename, proxy=None):
+        """Blocking fetch for prefetch workers, through the download engine"""
+        return self.get_download_engine().fetch(text, language, filename, proxy)
         
     def play_audio(self, filename):
         """Play audio file"""
         try:
-            pygame.mixer.music.load(filename)
-            pygame.mixer.music.play()
+            import pygame
+            if not self.mixer_ready.wait(5):
+                raise RuntimeError("audio device is not ready")
+            with metrics.span("play_audio.load"):
+                sound = self.sound_cache.get(filename)
+            with metrics.span("play_audio.start"):
+                pygame.mixer.music.stop()
+                pygame.mixer.stop()
+                sound.play()
         except Exception as e:
             messagebox.showerror("Error", f"Play audio failed: {e}")
             
     def update_status(self, message):
-        """Update status message"""
-        self.status_var.set(message)
-        self.root.update_idletasks()
+        """Update status message; safe to call from any thread"""
+        self.ui_events.status(message)
         print(message)
         
     def on_download_all(self):
         """Download all audio files for current level"""
-        def download_thread():
-            self.download_btn.config(state="disabled")
-            success_count = 0
-            total_count = len(self.words)
+        level = self.level_var.get()
+        audio_dir = self.get_audio_dir()
+        texts = [russian for russian, english in self.level_store.get(level)]
+        proxy = self.get_proxy()
+        
+        def progress(done, total, result):
+            self.update_status(f"Downloading {level} {done}/{total} "
+                               f"({result.downloaded} new, {len(result.failed)} failed)")
+        
+        def download_done(future):
+            self.ui_events.call(self.download_btn.config, state="normal")
+            try:
+                result = future.result()
+            except Exception as e:
+                self.update_status(f"Download of level {level} failed: {e}")
+                return
+            total_count = result.total
+            success_count = result.success
+            if result.cancelled:
+                self.update_status(f"Download of level {level} cancelled: {success_count}/{total_count} files")
+                return
             
-            for i, (russian, english) in enumerate(self.words):
-                self.update_status(f"Downloading {i+1}/{len(self.words)}: {russian}")
-                
-                # Download Russian audio
-                if self.download_audio(russian, "ru"):
-                    success_count += 1
-                        
-            self.update_status(f"Download completed: {success_count}/{total_count} files")
-            self.download_btn.config(state="normal")
-            messagebox.showinfo("Download Complete", f"Downloaded {success_count}/{total_count} audio files for level {self.level_var.get()}")
+            self.update_status(f"Download completed: {success_count}/{total_count} files "
+                               f"in {result.elapsed:.1f}s")
+            self.ui_events.call(messagebox.showinfo, "Download Complete",
+                                f"Downloaded {success_count}/{total_count} audio files for level {level}")
             
-        thread = threading.Thread(target=download_thread)
-        thread.daemon = True
-        thread.start()
+        self.download_btn.config(state="disabled")
+        # The job is bound to this level's folder, whatever level is selected later
+        self.bulk_job = self.get_download_engine().submit_bulk(level, audio_dir, texts, language="ru",
+                                                         proxy=proxy, progress=progress)
+        self.bulk_job.future.add_done_callback(download_done)
         
     def play_current_word(self):
         """Play the currently selected Russian word"""
         if 0 <= self.current_selection < len(self.words):
             russian_word = self.words[self.current_selection][0]
-            filename = self.download_audio(russian_word, "ru")
-            if filename:
+            filename = audio_filename(self.get_audio_dir(), russian_word, "ru")
+            if is_cached(filename):
                 self.play_audio(filename)
                 self.update_status(f"Playing: {russian_word}")
-            else:
-                messagebox.showerror("Error", f"Cannot play audio for: {russian_word}")
+                return
+            
+            # Already being fetched by a worker: play when it lands
+            future, owned = self.prefetcher.claim(russian_word, self.get_audio_dir())
+            if not owned:
+                self.update_status(f"Downloading ru audio: {russian_word}")
+                future.add_done_callback(
+                    lambda f: self.ui_events.call(self.play_when_ready, f, russian_word))
+                return
+            
+            # Not cached yet: stream it, starting playback while it downloads
+            self.update_status(f"Streaming ru audio: {russian_word}")
+            proxy = self.get_proxy()
+            
+            def stream_thread():
+                result = (None, "audio device is not ready")
+                try:
+                    if self.mixer_ready.wait(5):
+                        result = stream_and_play(self.downloader, russian_word, "ru", filename, proxy)
+                except Exception as e:
+                    result = (None, str(e) or type(e).__name__)
+                finally:
+                    # Always settle the claim, or later requests would wait on it forever
+                    self.prefetcher.release(future, filename, result)
+                if result[0] and result[1] is None:
+                    self.update_status(f"Playing: {russian_word}")
+                else:
+                    self.update_status(f"Cannot play: {russian_word} ({result[1]})")
+                    self.ui_events.call(messagebox.showerror, "Error", f"Cannot play audio for: {russian_word}")
+            
+            threading.Thread(target=stream_thread, name="stream-play", daemon=True).start()
+            
+    def play_when_ready(self, future, russian_word):
+        """Play a word whose download finished on a worker thread"""
+        filename, error = future.result() if not future.cancelled() else (None, "cancelled")
+        if filename:
+            self.play_audio(filename)
+            self.update_status(f"Playing: {russian_word}")
+        else:
+            self.update_status(f"Download failed: {russian_word} ({error})")
+            messagebox.showerror("Error", f"Cannot play audio for: {russian_word}")
+        
+    def schedule_prefetch(self):
+        """Prefetch audio for the words reachable from the current selection"""
+        if self.drill_cards is not None:
+            # Drilling: stage the next cards instead of grid neighbours
+            staged = [(russian, english) for _, _, russian, english in self.drill_cards]
+            if staged:
+                self.prefetcher.update(staged, 0, len(staged), self.get_audio_dir(), proxy=self.get_proxy())
+        elif self.words:
+            self.prefetcher.update(self.words, self.current_selection, self.current_columns,
+                                   self.get_audio_dir(), proxy=self.get_proxy())
+        
+    def toggle_drill(self):
+        if self.drill_cards is None:
+            self.start_drill()
+        else:
+            self.stop_drill()
+        
+    def on_drill_key(self, event):
+        if not isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            self.toggle_drill()
+        
+    def start_drill(self):
+        """Review due and new words from every level, one card at a time"""
+        self.search_var.set("")
+        self.drill_btn.config(state="disabled")
+        self.update_status("Loading review history...")
+        
+        def load_thread():
+            try:
+                with metrics.span("drill.load"):
+                    # Only records appended since the last drill are read
+                    self.drill_scheduler.load()
+                    for level in self.levels:
+                        self.level_store.get(level)  # Unloaded levels reach the scheduler via on_load
+            except Exception as e:
+                self.update_status(f"Cannot start drill: {e}")
+                self.ui_events.call(self.drill_btn.config, state="normal")
+                return
+            self.ui_events.call(self.begin_drill)
+        
+        threading.Thread(target=load_thread, name="drill-load", daemon=True).start()
+        
+    def begin_drill(self):
+        self.drill_btn.config(state="normal", text="Stop Drill")
+        self.drill_cards = []
+        self.show_drill_card()
+        
+    def stop_drill(self, refresh=True):
+        if self.drill_job is not None:
+            self.root.after_cancel(self.drill_job)
+            self.drill_job = None
+        self.drill_cards = None
+        self.drill_btn.config(state="normal", text="Start Drill")
+        if refresh:
+            self.load_level_data(self.level_var.get())
+            self.refresh_word_list()
+            self.update_status(f"Level {self.level_var.get()}: {len(self.words)} words")
+        
+    def show_drill_card(self):
+        """Show the next due card and play it; its followers are staged meanwhile"""
+        self.drill_job = None
+        with metrics.span("drill.next"):
+            self.drill_cards = self.drill_scheduler.upcoming(self.drill_stage + 1)
+        self.drill_revealed = False
+        if not self.drill_cards:
+            self.words = []
+            self.refresh_word_list()
+            self.english_var.set("English: ")
+            next_due = self.drill_scheduler.next_due()
+            if next_due is None:
+                self.update_status("Drill: nothing to review")
+                return
+            wait = max(1.0, next_due - time.time())
+            self.update_status(f"Drill: all done, next review at {time.strftime('%H:%M', time.localtime(next_due))}")
+            if wait < 3600:
+                self.drill_job = self.root.after(int(wait * 1000), self.show_drill_card)
+            return
+        
+        _, level, russian, english = self.drill_cards[0]
+        self.words = [(russian, english)]
+        self.refresh_word_list()
+        self.play_current_word()
+        due, new = self.drill_scheduler.counts()
+        self.update_status(f"Drill [{level}]: {due} due, {new} new - "
+                           f"Space: show, 1 Again, 2 Hard, 3 Good, 4 Easy, Esc: stop")
+        
+    def on_drill_reveal(self, event):
+        if self.drill_cards and not isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            self.drill_revealed = True
+            self.update_selection()
+            return "break"
+        
+    def on_drill_grade(self, event, grade):
+        """Grade the current card and move on; grading needs the answer shown first"""
+        if not self.drill_cards or not self.drill_revealed or isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            return
+        key = self.drill_cards[0][0]
+        self.drill_scheduler.review(key, grade)
+        metrics.count("drill.reviews")
+        self.show_drill_card()
+        
+    def on_drill_escape(self, event):
+        if self.drill_cards is not None and not isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            self.stop_drill()
         
     def update_selection(self):
         """Update the visual selection and English translation"""
         # Update Russian word buttons color
-        for i, button in enumerate(self.russian_buttons):
-            if i == self.current_selection:
-                button.config(style="Selected.TButton")
-            else:
-                button.config(style="TButton")
+        self.word_grid.set_selection(self.current_selection)
         
         # Update English translation
         if 0 <= self.current_selection < len(self.words):
             english_word = self.words[self.current_selection][1]
+            if self.drill_cards is not None and not self.drill_revealed:
+                english_word = "? (Space to show)"
             self.english_var.set(f"English: {english_word}")
+            self.schedule_prefetch()
         
     def move_selection(self, direction):
         """Move selection in the given direction for dynamic columns layout with auto-scroll"""
@@ -279,85 +597,64 @@ class RussianVocabularyApp:
             self.update_selection()
             self.auto_scroll_to_selection()
 
+    @metrics.timed("auto_scroll_to_selection")
     def auto_scroll_to_selection(self):
         """Automatically scroll to make the selected item visible"""
-        if not hasattr(self, 'canvas') or not hasattr(self, 'scrollable_frame'):
+        if not hasattr(self, 'word_grid'):
             return
             
         try:
-            # Get the selected button
-            if 0 <= self.current_selection < len(self.russian_buttons):
-                button = self.russian_buttons[self.current_selection]
-                
-                # Get button position relative to scrollable frame
-                button_y = button.winfo_y()
-                button_height = button.winfo_height()
-                
-                # Get canvas viewport info
-                canvas_height = self.canvas.winfo_height()
-                current_scroll = self.canvas.yview()[0]  # Current scroll position (0-1)
-                total_height = self.scrollable_frame.winfo_height()
-                
-                # Calculate visible range in pixels
-                visible_top = current_scroll * total_height
-                visible_bottom = visible_top + canvas_height
-                
-                # Check if button is outside visible area
-                if button_y < visible_top:
-                    # Button is above visible area - scroll up
-                    target_scroll = button_y / total_height
-                    self.canvas.yview_moveto(target_scroll)
-                elif button_y + button_height > visible_bottom:
-                    # Button is below visible area - scroll down
-                    target_scroll = (button_y + button_height - canvas_height) / total_height
-                    self.canvas.yview_moveto(target_scroll)
-                    
+            self.word_grid.see(self.current_selection)
         except Exception as e:
             print(f"Auto-scroll error: {e}")
         
     def on_level_changed(self):
         """Callback when level selection changes"""
         level = self.level_var.get()
+        if self.drill_cards is not None:
+            self.stop_drill(refresh=False)
+        if self.bulk_job is not None and self.bulk_job.level != level:
+            # Stop downloading a level the user has left
+            self.bulk_job.cancel()
+            self.bulk_job = None
         self.load_level_data(level)
         self.refresh_word_list()
         self.update_status(f"Switched to level {level}")
+        if self.search_var.get().strip():
+            self.apply_search()
+        self.preload_adjacent_levels()
         
+    @metrics.timed("refresh_word_list")
     def refresh_word_list(self):
         """Refresh the word list display with dynamic columns"""
-        # Clear existing widgets
-        for widget in self.word_frame.winfo_children():
-            widget.destroy()
-        
-        # Use current columns
-        columns = self.current_columns
-        
-        # Recreate Russian word buttons in dynamic columns
-        self.russian_buttons = []
-        for i, (russian, english) in enumerate(self.words):
-            row = i // columns  # Calculate row
-            col = i % columns   # Calculate column
-            
-            button = ttk.Button(
-                self.word_frame, 
-                text=russian,
-                width=30,
-                command=lambda idx=i: self.select_word(idx)
-            )
-            button.grid(row=row, column=col, padx=5, pady=2, sticky="w")
-            self.russian_buttons.append(button)
+        # Only the visible rows get widgets; they are recycled while scrolling
+        self.word_grid.set_columns(self.current_columns)
+        self.word_grid.set_words(self.words)
         
         # Update selection
         self.current_selection = 0
         self.update_selection()
         
+    def relayout_word_list(self, columns):
+        """Re-grid the existing widgets for a new column count, keeping the selection"""
+        with metrics.span("relayout_word_list", columns=columns) as span:
+            self.current_columns = columns
+            self.word_grid.set_columns(columns)
+            self.word_grid.see(self.current_selection)
+        self.last_relayout_ms = span.ms
+        
     def on_window_resize(self, event):
         """当窗口大小改变时自动调整列数"""
         # 只有当是主窗口改变大小时才处理
         if event.widget == self.root:
-            self.adjust_columns_based_on_width()
+            # 拖动窗口时会产生大量事件，只在停止后处理一次
+            if self.resize_job is not None:
+                self.root.after_cancel(self.resize_job)
+            self.resize_job = self.root.after(self.resize_debounce_ms, self.adjust_columns_based_on_width)
 
     def adjust_columns_based_on_width(self):
         """根据窗口宽度调整列数"""
+        self.resize_job = None
         try:
             # 获取主窗口宽度
             window_width = self.root.winfo_width()
@@ -374,8 +671,7 @@ class RussianVocabularyApp:
             
             # 如果列数发生变化，重新布局
             if new_columns != self.current_columns:
-                self.current_columns = new_columns
-                self.refresh_word_list()
+                self.relayout_word_list(new_columns)
                 
         except Exception as e:
             print(f"Adjust columns error: {e}")
@@ -393,11 +689,18 @@ class RussianVocabularyApp:
         
     def bind_keyboard_events(self):
         """Bind keyboard events for navigation"""
-        self.root.bind('h', lambda e: self.move_selection('left'))
-        self.root.bind('j', lambda e: self.move_selection('down'))
-        self.root.bind('k', lambda e: self.move_selection('up'))
-        self.root.bind('l', lambda e: self.move_selection('right'))
+        self.root.bind('h', lambda e: self.on_nav_key(e, 'left'))
+        self.root.bind('j', lambda e: self.on_nav_key(e, 'down'))
+        self.root.bind('k', lambda e: self.on_nav_key(e, 'up'))
+        self.root.bind('l', lambda e: self.on_nav_key(e, 'right'))
         self.root.bind('<Return>', lambda e: self.play_current_word())
+        self.root.bind('<slash>', self.focus_search)
+        self.root.bind('d', self.on_drill_key)
+        self.root.bind('<space>', self.on_drill_reveal)
+        self.root.bind('<Escape>', self.on_drill_escape)
+        for key, grade in (('1', GRADE_AGAIN), ('2', GRADE_HARD), ('3', GRADE_GOOD), ('4', GRADE_EASY)):
+            self.root.bind(key, lambda e, grade=grade: self.on_drill_grade(e, grade))
+        self.search_entry.bind('<Escape>', self.on_search_escape)
         self.root.focus_set()
         
     def create_widgets(self):
@@ -452,6 +755,23 @@ class RussianVocabularyApp:
                                       command=self.on_download_all)
         self.download_btn.grid(row=2, column=0, columnspan=2, pady=5)
         
+        # Search box: filters the word list as you type ("/" to focus, Escape to clear)
+        search_frame = ttk.Frame(settings_frame)
+        search_frame.grid(row=3, column=0, columnspan=2, sticky="w", pady=5)
+        
+        ttk.Label(search_frame, text="Search:").grid(row=0, column=0, padx=5)
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=30)
+        self.search_entry.grid(row=0, column=1, padx=5)
+        self.search_var.trace_add("write", self.on_search_changed)
+        
+        search_all = ttk.Checkbutton(search_frame, text="All levels", variable=self.search_all_levels,
+                                     command=self.on_search_scope_changed)
+        search_all.grid(row=0, column=2, padx=5)
+        
+        # Drill button: review due words of every level ("d" toggles it)
+        self.drill_btn = ttk.Button(settings_frame, text="Start Drill", command=self.toggle_drill)
+        self.drill_btn.grid(row=4, column=0, columnspan=2, pady=5)
+        
         # Russian words frame
         russian_frame = ttk.LabelFrame(main_frame, text=f"Russian Words - Level {self.level_var.get()} - Use h/j/k/l to navigate, Enter to play", padding="10")
         russian_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
@@ -463,15 +783,9 @@ class RussianVocabularyApp:
         # Create canvas and scrollbar for Russian words
         self.canvas = tk.Canvas(russian_container, height=300)
         scrollbar = ttk.Scrollbar(russian_container, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ttk.Frame(self.canvas)
-        
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
         
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        # Virtualized grid: only rows visible in the canvas are materialized
+        self.word_grid = VirtualWordGrid(self.canvas, self.select_word, scrollbar=scrollbar)
         
         # 绑定鼠标滚轮事件到 Canvas
         def on_canvas_mousewheel(event):
@@ -493,22 +807,16 @@ class RussianVocabularyApp:
         def on_root_mousewheel(event):
             # 检查事件是否发生在单词列表区域内
             if (event.widget == self.canvas or 
-                event.widget == self.scrollable_frame or 
-                event.widget == self.word_frame or
                 str(event.widget).startswith(str(self.canvas))):
                 on_canvas_mousewheel(event)
         
         def on_root_linux_scroll_up(event):
             if (event.widget == self.canvas or 
-                event.widget == self.scrollable_frame or 
-                event.widget == self.word_frame or
                 str(event.widget).startswith(str(self.canvas))):
                 on_canvas_linux_scroll_up(event)
         
         def on_root_linux_scroll_down(event):
             if (event.widget == self.canvas or 
-                event.widget == self.scrollable_frame or 
-                event.widget == self.word_frame or
                 str(event.widget).startswith(str(self.canvas))):
                 on_canvas_linux_scroll_down(event)
         
@@ -520,10 +828,6 @@ class RussianVocabularyApp:
         # 绑定窗口大小变化事件
         self.root.bind('<Configure>', self.on_window_resize)
         
-        # Word frame inside scrollable frame
-        self.word_frame = ttk.Frame(self.scrollable_frame)
-        self.word_frame.pack(fill="both", expand=True)
-        
         # Pack canvas and scrollbar
         self.canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -562,7 +866,25 @@ class RussianVocabularyApp:
         self.update_selection()
         self.play_current_word()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Russian vocabulary trainer")
+    parser.add_argument("--metrics", metavar="FILE", default=None,
+                        help="export timing spans on exit (.json or .csv)")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+                        help="capture a cProfile of the session")
+    args, _ = parser.parse_known_args(argv)
+    return args
+
 if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    profiler = start_profiler(args.profile)
     root = tk.Tk()
     app = RussianVocabularyApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    if profiler:
+        profiler.stop()
+    export_path = metrics_path(args.metrics)
+    if export_path:
+        metrics.export(export_path)
+        print(f"Metrics written to {export_path}")
+    metrics.print_summary()
\ No newline at end of file
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""Asyncio download engine for bulk jobs and prefetching, with priorities
+
+The engine runs its own event loop on a background thread.  Every bulk job
+is bound to the level and audio directory it was created for, so switching
+level can never redirect files into the wrong folder, and a job can be
+cancelled promptly.  Prefetch requests are always served before bulk
+downloads, and a few workers are reserved for them so a running bulk job
+cannot hold up the clips around the selected word.  Playing a clip that
+is not cached yet does not go through the engine: it is streamed on its
+own thread (see audio_stream), so it never waits behind queued work.
+
+HTTP backends use aiohttp when it is installed; otherwise, and for other
+backends, synthesis runs on the default thread pool.  aiohttp is imported
+on the loop thread, so importing this module stays cheap.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+from concurrent.futures import Future
+
+from audio_downloader import DownloadResult, audio_filename, make_proxies, missing_audio
+from audio_manifest import get_manifest
+from instrumentation import metrics
+from tts_backends import HTTPTTS, TTSError
+
+PRIORITY_PREFETCH = 0
+PRIORITY_BULK = 1
+
+
+class BulkJob:
+    """Handle for a level's bulk download; cancel() stops it promptly"""
+
+    def __init__(self, engine, level, audio_dir, language, texts, proxy, progress):
+        self.engine = engine
+        self.level = level
+        self.audio_dir = audio_dir
+        self.language = language
+        self.proxy = proxy
+        self.progress = progress
+        self.result = DownloadResult(len(texts))
+        self.future = Future()
+        self.cancelled = False
+        self.remaining = 0
+        self.tasks = set()
+
+    def cancel(self):
+        """Cancel queued and in-flight downloads of this job; safe from any thread"""
+        self.engine.loop.call_soon_threadsafe(self.engine._cancel_job, self)
+
+    def done(self):
+        return self.future.done()
+
+
+class AsyncDownloadEngine:
+    """Event-loop based downloader sharing backends and limits with a BulkDownloader"""
+
+    def __init__(self, downloader, concurrency=8, prefetch_reserve=2):
+        self.downloader = downloader
+        self.concurrency = max(1, concurrency)
+        self.prefetch_reserve = min(prefetch_reserve, self.concurrency - 1)  # Keep one for bulk work
+        self.heap = []  # (priority, seq, job, text, filename, future)
+        self.seq = itertools.count()
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="download-engine", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    # Event loop thread
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._setup())
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _setup(self):
+        self.cond = asyncio.Condition()
+        self.http = None
+        try:
+            import aiohttp
+        except ImportError:
+            aiohttp = None
+        self.aiohttp = aiohttp
+        if aiohttp is not None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            self.http = aiohttp.ClientSession(connector=connector)
+        self.workers = [
+            self.loop.create_task(self._worker(reserved=i < self.prefetch_reserve))
+            for i in range(self.concurrency)
+        ]
+
+    def _can_take(self, reserved):
+        return self.heap and (not reserved or self.heap[0][0] < PRIORITY_BULK)
+
+    async def _worker(self, reserved):
+        while True:
+            async with self.cond:
+                await self.cond.wait_for(lambda: self._can_take(reserved))
+                priority, _, job, text, filename, future = heapq.heappop(self.heap)
+            if job is not None and job.cancelled:
+                continue
+            if future is not None and not future.set_running_or_notify_cancel():
+                continue
+
+            proxy = job.proxy if job is not None else future.proxy
+            language = job.language if job is not None else future.language
+            # A child task, so cancelling a job never cancels the worker itself
+            task = self.loop.create_task(self._fetch(text, language, filename, proxy))
+            if job is not None:
+                job.tasks.add(task)
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+                result = (None, "cancelled")
+            except Exception as e:
+                result = (None, str(e))
+            finally:
+                if job is not None:
+                    job.tasks.discard(task)
+
+            if job is not None:
+                self._job_item_done(job, text, filename, result)
+            else:
+                future.set_result(result)
+
+    async def _synthesize(self, backend, text, language, proxy):
+        timeout = self.downloader.timeout
+        if self.http is not None and isinstance(backend, HTTPTTS):
+            url = backend.build_url(text, language)
+            try:
+                with metrics.span("tts.connect", backend=backend.name, engine="async"):
+                    response = await self.http.get(url, headers=backend.headers, proxy=proxy,
+                                                   timeout=self.aiohttp.ClientTimeout(total=timeout))
+                async with response:
+                    if response.status != 200:
+                        retry_after = response.headers.get("Retry-After")
+                        raise TTSError(f"Status: {response.status}", response.status,
+                                       float(retry_after) if retry_after and retry_after.isdigit() else None)
+                    with metrics.span("tts.transfer", backend=backend.name, engine="async"):
+                        return await response.read()
+            except (self.aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise TTSError(str(e) or type(e).__name__)
+        return await asyncio.to_thread(backend.synthesize, self.downloader.session, text, language,
+                                       timeout=timeout, proxies=make_proxies(proxy))
+
+    async def _fetch(self, text, language, filename, proxy):
+        with metrics.span("download_audio", engine="async"):
+            return await self._download(text, language, filename, proxy)
+
+    async def _download(self, text, language, filename, proxy):
+        """Async twin of BulkDownloader.fetch, sharing its retry policy and file writing"""
+        downloader = self.downloader
+        backend = downloader.backend_for(language)
+        host = backend.rate_key()
+        error = None
+        for attempt in range(downloader.retries + 1):
+            delay = downloader.limiter.reserve(host)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                content = await self._synthesize(backend, text, language, proxy)
+            except TTSError as e:
+                error, failure = str(e), e
+            else:
+                if await asyncio.to_thread(downloader.save, text, language, filename, content):
+                    return filename, None
+                error, failure = "Invalid audio data", None
+            delay = downloader.retry_wait(failure, attempt, host)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        return None, error
+
+    async def _push(self, items):
+        async with self.cond:
+            for item in items:
+                heapq.heappush(self.heap, item)
+            self.cond.notify_all()
+
+    def _job_item_done(self, job, text, filename, result):
+        if result[0]:
+            job.result.downloaded += 1
+            job.result.bytes += os.path.getsize(filename)
+        elif not job.cancelled:
+            job.result.failed.append((text, result[1]))
+        job.remaining -= 1
+        if job.progress and not job.cancelled:
+            job.progress(job.result.total - job.remaining, job.result.total, job.result)
+        if job.remaining == 0:
+            self._finish_job(job)
+
+    def _finish_job(self, job):
+        get_manifest(job.audio_dir).save()
+        job.result.elapsed = self.loop.time() - job.started
+        job.result.cancelled = job.cancelled
+        if not job.future.done():
+            job.future.set_result(job.result)
+
+    def _cancel_job(self, job):
+        if job.cancelled or job.future.done():
+            return
+        job.cancelled = True
+        queued = [item for item in self.heap if item[2] is job]
+        if queued:
+            self.heap = [item for item in self.heap if item[2] is not job]
+            heapq.heapify(self.heap)
+            job.remaining -= len(queued)
+        for task in list(job.tasks):
+            task.cancel()
+        if job.remaining == 0:
+            self._finish_job(job)
+
+    async def _start_job(self, job, texts):
+        if job.future.done():
+            return
+        try:
+            pending = await asyncio.to_thread(missing_audio, texts, job.audio_dir, job.language)
+        except Exception as e:
+            # Nothing was queued; fail the job rather than leave its future pending
+            job.future.set_exception(e)
+            return
+        job.result.cached = job.result.total - len(pending)
+        job.remaining = len(pending)
+        if job.progress:
+            job.progress(job.result.cached, job.result.total, job.result)
+        if job.cancelled or not pending:
+            job.remaining = 0
+            self._finish_job(job)
+            return
+        await self._push([
+            (PRIORITY_BULK, next(self.seq), job, text, audio_filename(job.audio_dir, text, job.language), None)
+            for text in pending
+        ])
+
+    # Public API, callable from any thread
+
+    def submit_bulk(self, level, audio_dir, texts, language="ru", proxy=None, progress=None):
+        """Queue every missing file of a level; returns a BulkJob whose future yields a DownloadResult"""
+        job = BulkJob(self, level, audio_dir, language, texts, proxy, progress)
+        job.started = self.loop.time()
+        asyncio.run_coroutine_threadsafe(self._start_job(job, list(texts)), self.loop)
+        return job
+
+    def submit(self, text, language, filename, proxy=None, priority=PRIORITY_PREFETCH):
+        """Queue one file ahead of bulk work; returns a Future of (filename, error)"""
+        future = Future()
+        future.language = language
+        future.proxy = proxy
+        item = (priority, next(self.seq), None, text, filename, future)
+        asyncio.run_coroutine_threadsafe(self._push([item]), self.loop)
+        return future
+
+    def fetch(self, text, language, filename, proxy=None, priority=PRIORITY_PREFETCH):
+        """Blocking fetch with the BulkDownloader.fetch signature, for worker threads"""
+        return self.submit(text, language, filename, proxy, priority).result()
+
+    def shutdown(self):
+        async def close():
+            for worker in self.workers:
+                worker.cancel()
+            if self.http is not None:
+                await self.http.close()
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""Packed per-level audio bundles read through mmap
+
+A bundle is one file holding a level's clips back to back behind an index,
+so shipping or scanning a level touches one file instead of thousands and
+playback slices bytes out of a shared mapping instead of opening a file
+per word.  Bundles are mounted read-only; a clip name found in any mounted
+bundle counts as cached (see AudioManifest.has_file).
+
+Layout: header, NUL separated "name, text" payload, one (offset, size)
+entry per clip, then the mp3 data.
+
+Examples:
+    python audio_bundle.py pack --all
+    python audio_bundle.py pack C1 --prune
+    python audio_bundle.py unpack C1
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+
+BUNDLE_MAGIC = b"RAB1"
+# magic, clip count, payload length
+BUNDLE_HEADER = struct.Struct("<4sII")
+# data offset, data size
+BUNDLE_ENTRY = struct.Struct("<QI")
+SEPARATOR = "\x00"
+
+
+class AudioBundle:
+    """Read-only view of a bundle file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.stat = os.stat(path)
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.stat.st_size else b""
+        self.clips = {}  # name -> (offset, size)
+        self.texts = {}  # name -> text
+        self._read_index()
+
+    def _read_index(self):
+        data = self.map
+        if len(data) < BUNDLE_HEADER.size:
+            raise ValueError(f"{self.path} is not an audio bundle")
+        magic, count, length = BUNDLE_HEADER.unpack_from(data)
+        entries_at = BUNDLE_HEADER.size + length
+        if magic != BUNDLE_MAGIC or len(data) < entries_at + count * BUNDLE_ENTRY.size:
+            raise ValueError(f"{self.path} is not an audio bundle")
+        parts = bytes(data[BUNDLE_HEADER.size:entries_at]).decode("utf-8").split(SEPARATOR) if count else []
+        if len(parts) != count * 2:
+            raise ValueError(f"{self.path} has a corrupt index")
+        for i, (offset, size) in enumerate(BUNDLE_ENTRY.iter_unpack(data[entries_at:entries_at + count * BUNDLE_ENTRY.size])):
+            if offset + size > len(data):
+                raise ValueError(f"{self.path} is truncated")
+            name = parts[2 * i]
+            self.clips[name] = (offset, size)
+            self.texts[name] = parts[2 * i + 1]
+
+    def __contains__(self, name):
+        return name in self.clips
+
+    def __len__(self):
+        return len(self.clips)
+
+    def read(self, name):
+        """Zero-copy memoryview of a clip's mp3 bytes, or None"""
+        entry = self.clips.get(name)
+        if entry is None:
+            return None
+        offset, size = entry
+        return memoryview(self.map)[offset:offset + size]
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+
+
+def write_bundle(path, clips):
+    """Write clips, (name, text, mp3 bytes) triples, as one bundle file; returns its size"""
+    payload = SEPARATOR.join(part for name, text, _ in clips for part in (name, text)).encode("utf-8")
+    offset = BUNDLE_HEADER.size + len(payload) + len(clips) * BUNDLE_ENTRY.size
+    entries = []
+    for _, _, data in clips:
+        entries.append(BUNDLE_ENTRY.pack(offset, len(data)))
+        offset += len(data)
+
+    with open(path, "wb") as f:
+        f.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, len(clips), len(payload)))
+        f.write(payload)
+        f.write(b"".join(entries))
+        for _, _, data in clips:
+            f.write(data)
+    return offset
+
+
+_mounted = {}  # bundle path -> AudioBundle
+_index = {}  # clip name -> AudioBundle holding it
+_lock = threading.Lock()
+
+
+def mount(path):
+    """Make a bundle's clips available to bundled()/read_clip(); remounts if it changed"""
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    with _lock:
+        bundle = _mounted.get(path)
+        if bundle is not None and (bundle.stat.st_mtime_ns, bundle.stat.st_size) == (stat.st_mtime_ns, stat.st_size):
+            return bundle
+    try:
+        new = AudioBundle(path)
+    except (OSError, ValueError) as e:
+        print(f"Cannot mount audio bundle {path}: {e}")
+        return None
+    with _lock:
+        old = _mounted.pop(path, None)
+        if old is not None:
+            for name in old.clips:
+                if _index.get(name) is old:
+                    del _index[name]
+        _mounted[path] = new
+        for name in new.clips:
+            _index.setdefault(name, new)
+    return new
+
+
+def unmount(path):
+    with _lock:
+        bundle = _mounted.pop(os.path.abspath(path), None)
+        if bundle is None:
+            return
+        for name in bundle.clips:
+            if _index.get(name) is bundle:
+                del _index[name]
+        # Clips dropped from the index may still be held by another bundle
+        for other in _mounted.values():
+            for name in other.clips:
+                _index.setdefault(name, other)
+    try:
+        bundle.close()
+    except BufferError:
+        pass  # A clip is still being decoded; the mapping goes away with it
+
+
+def mount_levels(words_dir, levels):
+    """Mount every level bundle that exists"""
+    from levels import level_bundle_path
+
+    for level in levels:
+        mount(level_bundle_path(words_dir, level))
+
+
+def bundled(name):
+    """True if a mounted bundle holds the clip named name"""
+    return name in _index
+
+
+def read_clip(name):
+    """mp3 bytes of a bundled clip as a memoryview, or None"""
+    bundle = _index.get(name)
+    return bundle.read(name) if bundle is not None else None
+
+
+# Pack / unpack tool
+
+
+def pack_level(words_dir, level, prune=False):
+    """Pack a level's clips into its bundle; returns (clips, bytes)
+
+    Clips come from the shared store, the level's legacy audio folders, or
+    the previous bundle when their loose copy was pruned, so repacking
+    never loses audio.  Legacy folders are only read.
+    """
+    from levels import audio_store_dir, level_bundle_path, level_excel_path
+    from audio_manifest import get_manifest, linked_path
+    from audio_store import link_legacy_audio, store_name
+    from vocab_cache import load_words
+
+    words = load_words(level_excel_path(words_dir, level))
+    link_legacy_audio(words_dir, level, words)
+    store_path = audio_store_dir(words_dir)
+    manifest = get_manifest(store_path)
+    path = level_bundle_path(words_dir, level)
+    current = mount(path)
+
+    clips = []
+    loose = []
+    seen = set()
+    for russian, english in words:
+        for text, language in ((russian, "ru"), (english, "en")):
+            name = store_name(text, language)
+            if name in seen:
+                continue
+            seen.add(name)
+            data = None
+            clip_path = os.path.join(store_path, name) if name in manifest.entries else linked_path(name)
+            if clip_path is not None:
+                try:
+                    with open(clip_path, "rb") as f:
+                        data = f.read()
+                    if name in manifest.entries:
+                        loose.append((name, clip_path))
+                except OSError:
+                    pass
+            if data is None and current is not None and name in current:
+                data = bytes(current.read(name))
+            if data:
+                clips.append((name, text, data))
+
+    if not clips and current is None:
+        return 0, 0
+    tmp_path = path + ".tmp"
+    size = write_bundle(tmp_path, clips)
+    unmount(path)  # Windows cannot replace a mapped file
+    os.replace(tmp_path, path)
+    mount(path)
+
+    if prune:
+        for name, clip_path in loose:
+            manifest.discard(name)
+            try:
+                os.remove(clip_path)
+            except OSError:
+                pass
+        manifest.save()
+    return len(clips), size
+
+
+def unpack_level(words_dir, level, names=None):
+    """Extract a level's bundle (or some of its clips) into the shared store"""
+    from levels import audio_store_dir, level_bundle_path
+    from audio_manifest import get_manifest
+
+    bundle = mount(level_bundle_path(words_dir, level))
+    if bundle is None:
+        return 0
+    store_path = audio_store_dir(words_dir)
+    os.makedirs(store_path, exist_ok=True)
+    manifest = get_manifest(store_path)
+    count = 0
+    for name in names if names is not None else list(bundle.clips):
+        data = bundle.read(name)
+        if data is None or name in manifest.entries:
+            continue
+        target = os.path.join(store_path, name)
+        tmp_path = target + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+        if manifest.record(target, bundle.texts[name], name.split("_", 1)[0]):
+            count += 1
+    manifest.save()
+    return count
+
+
+def parse_args(argv=None):
+    from levels import LEVELS, resource_path
+
+    parser = argparse.ArgumentParser(description="Convert level audio between loose files and bundles")
+    parser.add_argument("command", choices=["pack", "unpack"])
+    parser.add_argument("levels", nargs="*", metavar="LEVEL", help=f"levels to convert ({', '.join(LEVELS)})")
+    parser.add_argument("--all", action="store_true", help="convert every level")
+    parser.add_argument("--words-dir", default=resource_path("words"), help="root of the word_<level> folders")
+    parser.add_argument("--prune", action="store_true", help="after packing, delete the loose copies in the audio store")
+    args = parser.parse_args(argv)
+
+    levels = list(LEVELS) if args.all or not args.levels else args.levels
+    unknown = [level for level in levels if level not in LEVELS]
+    if unknown:
+        parser.error(f"unknown level(s): {', '.join(unknown)}")
+    args.levels = levels
+    return args
+
+
+def main(argv=None):
+    from levels import level_excel_path
+
+    args = parse_args(argv)
+    for level in args.levels:
+        if not os.path.exists(level_excel_path(args.words_dir, level)):
+            print(f"Skipping level {level}: no spreadsheet")
+            continue
+        if args.command == "pack":
+            count, size = pack_level(args.words_dir, level, prune=args.prune)
+            print(f"Level {level}: packed {count} clip(s), {size / 1024:.1f} KiB")
+        else:
+            count = unpack_level(args.words_dir, level)
+            print(f"Level {level}: unpacked {count} clip(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""LRU cache of decoded sounds so replays skip reopening and decoding the mp3"""
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from audio_bundle import read_clip
+from audio_manifest import linked_path
+from instrumentation import metrics
+
+
+def sound_size(sound):
+    """Bytes of PCM held by a decoded sound"""
+    import pygame
+    init = pygame.mixer.get_init()
+    if not init:
+        return 0
+    frequency, fmt, channels = init
+    return int(sound.get_length() * frequency) * channels * (abs(fmt) // 8)
+
+
+class SoundCache:
+    """Decoded pygame sounds bounded by a byte budget, least recently used evicted first"""
+
+    def __init__(self, budget_bytes=64 * 1024 * 1024, ready=None):
+        self.ready = ready  # Event set once the mixer is initialized
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()  # filename -> (mtime_ns, sound, nbytes)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filename):
+        """Return a decoded sound for filename, decoding and caching it on a miss
+
+        Clips missing on disk are read from their linked legacy copy, or
+        decoded straight from a mounted bundle.
+        """
+        clip = None
+        source = filename
+        try:
+            mtime_ns = os.stat(filename).st_mtime_ns
+        except FileNotFoundError:
+            source = linked_path(os.path.basename(filename))
+            if source is not None:
+                mtime_ns = os.stat(source).st_mtime_ns
+            else:
+                clip = read_clip(os.path.basename(filename))
+                if clip is None:
+                    raise
+                mtime_ns = 0  # Bundles do not change while mounted
+        with self.lock:
+            entry = self.entries.get(filename)
+            if entry is not None and entry[0] == mtime_ns:
+                self.entries.move_to_end(filename)
+                self.hits += 1
+                metrics.count("sound_cache.hit")
+                return entry[1]
+            self.misses += 1
+        metrics.count("sound_cache.miss")
+
+        # Decode outside the lock so a prefetch decode does not block playback
+        import pygame
+        if self.ready is not None:
+            self.ready.wait()
+        with metrics.span("audio.decode"):
+            if clip is not None:
+                sound = pygame.mixer.Sound(file=io.BytesIO(clip))
+            else:
+                sound = pygame.mixer.Sound(source)
+        self.put(filename, mtime_ns, sound)
+        return sound
+
+    def warm(self, filename):
+        """Decode filename ahead of time; safe to call from worker threads"""
+        try:
+            self.get(filename)
+        except Exception as e:
+            print(f"Cannot decode {filename}: {e}")
+
+    def put(self, filename, mtime_ns, sound):
+        nbytes = sound_size(sound)
+        with self.lock:
+            old = self.entries.pop(filename, None)
+            if old is not None:
+                self.used_bytes -= old[2]
+            if nbytes > self.budget_bytes:
+                return
+            self.entries[filename] = (mtime_ns, sound, nbytes)
+            self.used_bytes += nbytes
+            while self.used_bytes > self.budget_bytes:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.used_bytes -= evicted
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used_bytes = 0
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""Pooled, concurrent audio downloader shared by the app and batch tools"""
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from audio_manifest import get_manifest
+from audio_store import store_name
+from instrumentation import metrics
+from tts_backends import TTSError, get_backend
+
+
+def audio_filename(audio_dir, text, language):
+    """Full path of the cached mp3 for a word"""
+    return os.path.join(audio_dir, store_name(text, language))
+
+
+def missing_audio(texts, audio_dir, language="ru"):
+    """Texts with no valid audio recorded in the manifest, one per distinct clip"""
+    manifest = get_manifest(audio_dir)
+    missing = {}
+    for text in texts:
+        name = store_name(text, language)
+        if name not in missing and not manifest.has_file(name):
+            missing[name] = text
+    return list(missing.values())
+
+
+def make_proxies(proxy):
+    """Turn a proxy URL into a requests proxies mapping"""
+    if proxy:
+        return {'http': proxy, 'https': proxy}
+    return None
+
+
+class RateLimiter:
+    """Per-host request spacing shared by all worker threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, host):
+        """Claim the next request slot for host; returns seconds to wait for it
+
+        Without a rate only penalties delay requests.
+        """
+        if host is None or not (self.interval or self._next_slot):
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            if self.interval:
+                self._next_slot[host] = slot + self.interval
+        return slot - now
+
+    def wait(self, host):
+        """Block until the next request slot for host is available"""
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+
+    def penalize(self, host, delay):
+        """Push back the next slot for host, e.g. after a 429"""
+        with self._lock:
+            now = time.monotonic()
+            self._next_slot[host] = max(self._next_slot.get(host, now), now + delay)
+
+
+class DownloadResult:
+    """Summary of a bulk download run"""
+
+    def __init__(self, total):
+        self.total = total
+        self.downloaded = 0
+        self.cached = 0
+        self.failed = []
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    @property
+    def success(self):
+        return self.downloaded + self.cached
+
+    @property
+    def files_per_second(self):
+        return self.downloaded / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self):
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        return (f"DownloadResult(total={self.total}, downloaded={self.downloaded}, "
+                f"cached={self.cached}, failed={len(self.failed)}, elapsed={self.elapsed:.2f}s)")
+
+
+class BulkDownloader:
+    """Download TTS audio over a shared keep-alive pool with bounded concurrency
+
+    backends maps a language to a TTSBackend (or a registered backend name);
+    the "*" entry is used for languages without their own backend.
+    """
+
+    def __init__(self, workers=8, rate=10.0, retries=4, backoff=0.5, timeout=30, backends=None):
+        self.workers = max(1, workers)
+        self.backends = {"*": "google"}
+        self.backends.update(backends or {})
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Shared keep-alive session, created on the first download"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self.make_session()
+        return self._session
+
+    def make_session(self):
+        """Create a session whose connection pool matches the worker count"""
+        # Deferred so that starting the app does not pay for importing requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def backend_for(self, language):
+        """TTS backend for language, instantiating registered names on first use"""
+        key = language if language in self.backends else "*"
+        backend = self.backends[key]
+        if isinstance(backend, str):
+            backend = self.backends[key] = get_backend(backend)
+        return backend
+
+    def retry_delay(self, attempt, retry_after=None):
+        """Exponential backoff with jitter, honouring Retry-After when given"""
+        if retry_after is not None:
+            return retry_after
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+
+    @metrics.timed("download_audio")
+    def fetch(self, text, language, filename, proxy=None):
+        """Download one file, retrying on 429/5xx; returns (filename, error)"""
+        backend = self.backend_for(language)
+        host = backend.rate_key()
+        proxies = make_proxies(proxy)
+        error = None
+
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(host)
+            try:
+                content = backend.synthesize(self.session, text, language,
+                                             timeout=self.timeout, proxies=proxies)
+            except TTSError as e:
+                error, failure = str(e), e
+            else:
+                if self.save(text, language, filename, content):
+                    return filename, None
+                error, failure = "Invalid audio data", None
+            delay = self.retry_wait(failure, attempt, host)
+            if delay is None:
+                break
+            time.sleep(delay)
+
+        return None, error
+
+    def retry_wait(self, error, attempt, host):
+        """Seconds to wait before retrying a failed attempt, or None to give up
+
+        error is the TTSError raised, or None if the response was not audio.
+        A 429 also pushes back every other request to host.  Shared with the
+        async engine, so both retry alike.
+        """
+        retry_after = None
+        if error is not None:
+            if not error.retryable:
+                return None
+            retry_after = error.retry_after
+            if error.status == 429 and host is not None:
+                self.limiter.penalize(host, self.retry_delay(attempt, retry_after))
+        if attempt >= self.retries:
+            return None
+        metrics.count("download.retries")
+        return self.retry_delay(attempt, retry_after)
+
+    def save(self, text, language, filename, content):
+        """Write downloaded bytes into place and record them; False if they are not audio"""
+        with metrics.span("download.write"):
+            fd, tmp_name = self.temp_file(filename)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_name, filename)
+        metrics.count("download.bytes", len(content))
+        return get_manifest(os.path.dirname(filename)).record(filename, text, language)
+
+    def temp_file(self, filename):
+        """Unique temp file next to filename, so concurrent writers never collide"""
+        return tempfile.mkstemp(prefix=os.path.basename(filename) + ".", suffix=".part",
+                                dir=os.path.dirname(filename))
+
+    def fetch_stream(self, text, language, filename, buffer, proxy=None):
+        """Download one file chunk by chunk, mirroring it into buffer as it arrives
+
+        The chunks go to a temp file renamed into place on success, so the
+        level cache only ever sees complete files.  Errors end the buffer
+        with buffer.fail(); returns (filename, error) like fetch().
+        """
+        backend = self.backend_for(language)
+        self.limiter.wait(backend.rate_key())
+        fd, tmp_name = self.temp_file(filename)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                total, chunks = backend.open_stream(self.session, text, language,
+                                                    timeout=self.timeout, proxies=make_proxies(proxy))
+                buffer.total = total
+                with metrics.span("tts.transfer", backend=backend.name, streamed=True):
+                    for chunk in chunks:
+                        f.write(chunk)
+                        buffer.feed(chunk)
+            os.replace(tmp_name, filename)
+        except (TTSError, OSError) as e:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            buffer.fail(str(e))
+            return None, str(e)
+
+        if not get_manifest(os.path.dirname(filename)).record(filename, text, language):
+            buffer.fail("Invalid audio data")
+            return None, "Invalid audio data"
+        buffer.finish()
+        return filename, None
+
+    def download_all(self, texts, audio_dir, language="ru", proxy=None, progress=None):
+        """Fetch every missing file for texts, calling progress(done, total, result) as they finish"""
+        jobs = [(text, language, audio_filename(audio_dir, text, language))
+                for text in missing_audio(texts, audio_dir, language)]
+        return self.download_many(jobs, total=len(texts), proxy=proxy, progress=progress)
+
+    def download_many(self, jobs, total=None, proxy=None, progress=None):
+        """Fetch (text, language, filename) jobs, possibly spanning several levels"""
+        start = time.perf_counter()
+        result = DownloadResult(len(jobs) if total is None else total)
+        result.cached = result.total - len(jobs)
+
+        done = result.cached
+        if progress:
+            progress(done, result.total, result)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                pool.submit(self.fetch, text, language, filename, proxy): text
+                for text, language, filename in jobs
+            }
+            for future in as_completed(futures):
+                text = futures[future]
+                try:
+                    filename, error = future.result()
+                except Exception as e:
+                    filename, error = None, str(e)
+                if filename:
+                    result.downloaded += 1
+                    result.bytes += os.path.getsize(filename)
+                else:
+                    result.failed.append((text, error))
+                done += 1
+                if progress:
+                    progress(done, result.total, result)
+
+        for audio_dir in {os.path.dirname(filename) for _, _, filename in jobs}:
+            get_manifest(audio_dir).save()
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def close(self):
+        """Release pooled connections"""
+        if self._session is not None:
+            self._session.close()
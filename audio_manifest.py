@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""Per-level manifest of downloaded audio so lookups never stat the disk"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from audio_bundle import bundled
+
+MANIFEST_NAME = "manifest.json"
+SAVE_INTERVAL = 2.0  # Seconds between automatic saves while downloads land
+
+_linked = {}  # clip name -> path of a valid copy kept outside the store, see audio_store
+
+
+def file_checksum(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def looks_like_mp3(path):
+    """Cheap header check: ID3 tag or an MPEG audio frame sync"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(3)
+    except OSError:
+        return False
+    return head.startswith(b"ID3") or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0)
+
+
+class AudioManifest:
+    """Index of the mp3 files in one audio directory
+
+    Entries are keyed by file name and hold the word, language, size, mtime
+    and sha1 of the file.  On load the index is reconciled with a single
+    directory listing: files that vanished are dropped so they get fetched
+    again, and files that appeared are adopted.  A known file whose size
+    changed is deleted; one whose mtime changed is re-hashed and deleted if
+    its content no longer matches.
+    """
+
+    def __init__(self, audio_dir):
+        self.audio_dir = audio_dir
+        self.path = os.path.join(audio_dir, MANIFEST_NAME)
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self.last_save = 0.0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+
+        entries = {}
+        try:
+            listing = list(os.scandir(self.audio_dir))
+        except OSError:
+            listing = []
+        for entry in listing:
+            name = entry.name
+            if not name.endswith(".mp3") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            size = stat.st_size
+            known = stored.get(name)
+            if known is None:
+                if size > 0 and looks_like_mp3(entry.path):
+                    entries[name] = self.describe(entry.path, None, name.split("_", 1)[0])
+            elif known.get("size") != size or size == 0:
+                # Truncated or overwritten since it was recorded
+                self._remove_corrupt(entry.path)
+            elif known.get("mtime_ns") == stat.st_mtime_ns:
+                entries[name] = known
+            elif file_checksum(entry.path) == known.get("sha1"):
+                # Touched or copied, content intact
+                entries[name] = dict(known, mtime_ns=stat.st_mtime_ns)
+            else:
+                self._remove_corrupt(entry.path)
+
+        with self.lock:
+            self.entries = entries
+            self.dirty = entries != stored
+        self.save()
+
+    def describe(self, path, text, language):
+        return {
+            "text": text,
+            "language": language,
+            "size": os.path.getsize(path),
+            "mtime_ns": os.stat(path).st_mtime_ns,
+            "sha1": file_checksum(path),
+        }
+
+    def has_file(self, name):
+        """O(1) check that a valid copy of name is on disk, linked or in a mounted bundle"""
+        return name in self.entries or name in _linked or bundled(name)
+
+    def record(self, path, text, language, **extra):
+        """Add a file that just landed; invalid files are removed instead
+
+        extra keys (e.g. processed=<settings>) are stored with the entry.
+        """
+        name = os.path.basename(path)
+        if os.path.getsize(path) == 0 or not looks_like_mp3(path):
+            print(f"Discarding invalid audio file: {path}")
+            os.remove(path)
+            self.discard(name)
+            return False
+        info = self.describe(path, text, language)
+        info.update(extra)
+        with self.lock:
+            self.entries[name] = info
+            self.dirty = True
+        if time.monotonic() - self.last_save > SAVE_INTERVAL:
+            self.save()
+        return True
+
+    def discard(self, name):
+        with self.lock:
+            if self.entries.pop(name, None) is not None:
+                self.dirty = True
+
+    def verify(self, repair=True):
+        """Re-hash every file and return the names that are corrupt
+
+        With repair, corrupt files are deleted and dropped so they get
+        fetched again; otherwise nothing is changed.
+        """
+        bad = []
+        for name, info in list(self.entries.items()):
+            path = os.path.join(self.audio_dir, name)
+            try:
+                ok = file_checksum(path) == info["sha1"] and looks_like_mp3(path)
+            except OSError:
+                ok = False
+            if not ok:
+                bad.append(name)
+                if repair:
+                    self._remove_corrupt(path)
+                    self.discard(name)
+        self.save()
+        return bad
+
+    def _remove_corrupt(self, path):
+        """Delete a file whose content does not match its entry, so it is not adopted again"""
+        print(f"Discarding corrupt audio file: {path}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def save(self):
+        """Write the manifest atomically if anything changed"""
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                data = json.dumps(self.entries, ensure_ascii=False, sort_keys=True)
+                self.dirty = False
+                self.last_save = time.monotonic()
+            tmp_path = self.path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"Cannot save audio manifest {self.path}: {e}")
+
+
+def link_clip(name, path):
+    """Let the clip at path, outside any store, stand in for the clip called name"""
+    _linked[name] = path
+
+
+def linked_path(name):
+    """Path of the linked copy of name, or None"""
+    return _linked.get(name)
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(audio_dir):
+    """Shared manifest for audio_dir, loaded on first use"""
+    audio_dir = os.path.abspath(audio_dir)
+    with _manifests_lock:
+        manifest = _manifests.get(audio_dir)
+        if manifest is None:
+            manifest = _manifests[audio_dir] = AudioManifest(audio_dir)
+        return manifest
+
+
+def is_cached(path):
+    """Manifest-backed replacement for os.path.exists on audio files"""
+    return get_manifest(os.path.dirname(path)).has_file(os.path.basename(path))
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""Trim silence, normalize loudness and re-encode stored clips on a process pool
+
+Each clip goes through one ffmpeg run: leading and trailing silence are
+cut, loudness is normalized with the EBU R128 loudnorm filter and the
+result is re-encoded as mono mp3, optionally at a fixed low bitrate.
+Processed clips are marked in the audio manifest with the settings used,
+so later runs only touch clips that are new, re-downloaded or processed
+with other settings.  A clip processed before is re-encoded from itself
+when settings change; with --keep-originals the download as fetched is
+also kept in an originals/ folder of the store and encoded from instead,
+at the cost of storing every clip twice.  ffmpeg is found on PATH or via
+RUSSIAN_VOCAB_FFMPEG.
+
+Examples:
+    python audio_postprocess.py --all
+    python audio_postprocess.py --all --bitrate 32k --workers 8
+    python audio_postprocess.py --keep-originals
+    python audio_postprocess.py --dry-run
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from audio_manifest import get_manifest, looks_like_mp3
+from instrumentation import metrics, metrics_path
+
+FFMPEG_ENV = "RUSSIAN_VOCAB_FFMPEG"
+ORIGINALS_DIR = "originals"
+DEFAULT_SETTINGS = {
+    "silence_db": -50,  # Quieter than this counts as silence
+    "keep_silence": 0.05,  # Seconds left before and after the speech
+    "loudness": -16,  # Target integrated loudness, LUFS
+    "sample_rate": 24000,
+    "bitrate": None,  # e.g. "32k" for compact CBR; None keeps VBR quality 5
+}
+CLIP_TIMEOUT = 60
+
+
+def find_ffmpeg(path=None):
+    """ffmpeg executable from the argument, the environment or PATH, or None"""
+    return path or os.environ.get(FFMPEG_ENV) or shutil.which("ffmpeg")
+
+
+def settings_signature(settings):
+    """Short string recorded in the manifest for clips processed with settings"""
+    return ";".join(f"{key}={settings[key]}" for key in sorted(settings))
+
+
+def ffmpeg_command(ffmpeg, source, target, settings):
+    trim = (f"silenceremove=start_periods=1:start_threshold={settings['silence_db']}dB"
+            f":start_silence={settings['keep_silence']}")
+    # silenceremove only trims the start reliably, so trim the reversed clip for the end
+    filters = ",".join([trim, "areverse", trim, "areverse",
+                        f"loudnorm=I={settings['loudness']}:TP=-1.5:LRA=11"])
+    command = [ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y", "-i", source,
+               "-af", filters, "-ac", "1", "-ar", str(settings["sample_rate"]),
+               "-map_metadata", "-1", "-c:a", "libmp3lame"]
+    if settings["bitrate"]:
+        command += ["-b:a", settings["bitrate"]]
+    else:
+        command += ["-q:a", "5"]
+    command += ["-f", "mp3", target]
+    return command
+
+
+def original_path(audio_dir, name):
+    """Where the unprocessed copy of a stored clip is kept"""
+    return os.path.join(audio_dir, ORIGINALS_DIR, name)
+
+
+def clip_source(audio_dir, name, info, keep_originals=False):
+    """File to encode a clip from: its kept original if there is one, else the clip itself
+
+    With keep_originals, a clip not processed yet is first copied to the
+    originals folder so later runs with other settings start from it.
+    """
+    original = original_path(audio_dir, name)
+    stored = os.path.join(audio_dir, name)
+    if not info.get("processed"):
+        # New or re-downloaded: the stored clip is the original
+        if not keep_originals:
+            try:
+                os.remove(original)  # Left from an older download
+            except FileNotFoundError:
+                pass
+            return stored
+        os.makedirs(os.path.dirname(original), exist_ok=True)
+        tmp_path = original + ".part"
+        shutil.copyfile(stored, tmp_path)
+        os.replace(tmp_path, original)
+        return original
+    return original if os.path.exists(original) else stored
+
+
+def process_clip(ffmpeg, source, target, settings):
+    """Worker: write a processed copy of source next to target; returns (temp path, error)"""
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(target) + ".", suffix=".part",
+                                    dir=os.path.dirname(target))
+    os.close(fd)
+    try:
+        completed = subprocess.run(ffmpeg_command(ffmpeg, source, tmp_path, settings),
+                                   capture_output=True, timeout=CLIP_TIMEOUT)
+        if completed.returncode != 0:
+            error = completed.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise RuntimeError(error[-1] if error else f"ffmpeg exited with {completed.returncode}")
+        if os.path.getsize(tmp_path) == 0 or not looks_like_mp3(tmp_path):
+            raise RuntimeError("ffmpeg produced no audio")
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None, str(e) or type(e).__name__
+    return tmp_path, None
+
+
+class ProcessResult:
+    """Outcome of a post-processing run"""
+
+    def __init__(self, total):
+        self.total = total
+        self.processed = 0
+        self.skipped = 0  # Already processed with the same settings
+        self.failed = []  # (file name, error)
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.elapsed = 0.0
+
+
+def pending_clips(audio_dir, signature):
+    """Names of clips in audio_dir not yet processed with signature"""
+    manifest = get_manifest(audio_dir)
+    return [name for name, info in sorted(manifest.entries.items()) if info.get("processed") != signature]
+
+
+def process_dir(audio_dir, ffmpeg, settings=None, workers=None, progress=None, keep_originals=False):
+    """Process every new or changed clip in audio_dir across a pool of processes
+
+    Workers only write temp files; this process swaps them into place and
+    updates the manifest, so an interrupted run never leaves a clip half
+    written or wrongly marked as processed.  See clip_source for what each
+    clip is encoded from.
+    """
+    settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+    signature = settings_signature(settings)
+    manifest = get_manifest(audio_dir)
+    names = pending_clips(audio_dir, signature)
+    result = ProcessResult(len(manifest.entries))
+    result.skipped = result.total - len(names)
+    start = time.perf_counter()
+    if progress:
+        progress(result.skipped, result.total, result)
+
+    sources = {}
+    for name in names:
+        try:
+            sources[name] = clip_source(audio_dir, name, manifest.entries[name], keep_originals)
+        except OSError as e:
+            result.failed.append((name, f"cannot keep the original: {e}"))
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(process_clip, ffmpeg, source, os.path.join(audio_dir, name), settings): name
+                   for name, source in sources.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            target = os.path.join(audio_dir, name)
+            info = manifest.entries.get(name)
+            try:
+                tmp_path, error = future.result()
+            except Exception as e:
+                tmp_path, error = None, str(e)
+            if error is None and info is None:
+                # Dropped from the store while we worked on it
+                os.remove(tmp_path)
+                error = "removed during processing"
+            if error is not None:
+                result.failed.append((name, error))
+            else:
+                before = os.path.getsize(sources[name])
+                os.replace(tmp_path, target)
+                if manifest.record(target, info.get("text"), info.get("language"), processed=signature):
+                    result.processed += 1
+                    result.bytes_before += before
+                    result.bytes_after += os.path.getsize(target)
+                    metrics.count("postprocess.bytes_saved", before - os.path.getsize(target))
+                else:
+                    result.failed.append((name, "invalid output"))
+            if progress:
+                progress(result.skipped + result.processed + len(result.failed), result.total, result)
+    manifest.save()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def parse_args(argv=None):
+    from levels import LEVELS, resource_path
+
+    parser = argparse.ArgumentParser(description="Trim, normalize and re-encode the stored audio clips")
+    parser.add_argument("levels", nargs="*", metavar="LEVEL",
+                        help=f"levels whose legacy audio folders are migrated first ({', '.join(LEVELS)})")
+    parser.add_argument("--all", action="store_true", help="migrate every level first")
+    parser.add_argument("--words-dir", default=resource_path("words"), help="root of the word_<level> folders")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--bitrate", default=None, help="re-encode at this constant bitrate, e.g. 32k")
+    parser.add_argument("--loudness", type=float, default=DEFAULT_SETTINGS["loudness"],
+                        help="target loudness in LUFS")
+    parser.add_argument("--silence-db", type=float, default=DEFAULT_SETTINGS["silence_db"],
+                        help="level below which audio counts as silence")
+    parser.add_argument("--ffmpeg", default=None, help=f"ffmpeg executable (default: ${FFMPEG_ENV} or PATH)")
+    parser.add_argument("--keep-originals", action="store_true",
+                        help="keep an unprocessed copy of each clip to encode later runs from")
+    parser.add_argument("--dry-run", action="store_true", help="count the clips that would be processed")
+    parser.add_argument("--metrics", metavar="FILE", default=None, help="export timing spans (.json or .csv)")
+    args = parser.parse_args(argv)
+
+    levels = list(LEVELS) if args.all else args.levels
+    unknown = [level for level in levels if level not in LEVELS]
+    if unknown:
+        parser.error(f"unknown level(s): {', '.join(unknown)}")
+    args.levels = levels
+    args.settings = {"bitrate": args.bitrate, "loudness": args.loudness, "silence_db": args.silence_db}
+    return args
+
+
+def main(argv=None):
+    from levels import audio_store_dir, level_excel_path
+    from audio_store import adopt_legacy_audio, legacy_audio
+    from vocab_cache import load_words
+
+    args = parse_args(argv)
+    audio_dir = audio_store_dir(args.words_dir)
+    if not args.dry_run:
+        os.makedirs(audio_dir, exist_ok=True)
+    adoptable = set()
+    for level in args.levels:
+        excel_path = level_excel_path(args.words_dir, level)
+        if not os.path.exists(excel_path):
+            continue
+        if args.dry_run:
+            adoptable |= legacy_audio(args.words_dir, level, load_words(excel_path))
+        else:
+            adopt_legacy_audio(args.words_dir, level, load_words(excel_path))
+
+    settings = dict(DEFAULT_SETTINGS, **args.settings)
+    pending = pending_clips(audio_dir, settings_signature(settings))
+    print(f"{len(pending)} of {len(get_manifest(audio_dir).entries)} clip(s) need processing")
+    if adoptable:
+        print(f"{len(adoptable)} more clip(s) would be moved in from legacy audio folders first")
+    if args.dry_run or not pending:
+        return 0
+
+    ffmpeg = find_ffmpeg(args.ffmpeg)
+    if not ffmpeg:
+        print(f"ffmpeg not found; install it or set {FFMPEG_ENV}")
+        return 2
+
+    last_report = [0.0]
+
+    def progress(done, total, result):
+        now = time.monotonic()
+        if now - last_report[0] >= 1.0 or done == total:
+            last_report[0] = now
+            print(f"{done}/{total} ({result.processed} processed, {len(result.failed)} failed)", file=sys.stderr)
+
+    result = process_dir(audio_dir, ffmpeg, settings, workers=args.workers, progress=progress,
+                         keep_originals=args.keep_originals)
+
+    export_path = metrics_path(args.metrics)
+    if export_path:
+        metrics.export(export_path)
+        print(f"Metrics written to {export_path}")
+
+    for name, error in result.failed:
+        print(f"Failed: {name} ({error})")
+    saved = result.bytes_before - result.bytes_after
+    print(f"Processed {result.processed} clip(s) in {result.elapsed:.1f}s, "
+          f"{result.bytes_before / 1024:.1f} -> {result.bytes_after / 1024:.1f} KiB "
+          f"({saved / 1024:.1f} KiB saved), {result.skipped} already done, {len(result.failed)} failed")
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Background prefetch of audio for the words around the current selection"""
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+from audio_downloader import audio_filename
+from audio_manifest import is_cached
+
+
+def neighbour_indices(selection, total, columns):
+    """Indices likely to be played next, most likely first"""
+    candidates = [selection, selection + 1, selection + columns, selection - 1, selection - columns]
+    # Then the rest of the next row in reading order
+    candidates.extend(range(selection + 2, selection + columns + 1))
+    seen = set()
+    result = []
+    for index in candidates:
+        if 0 <= index < total and index not in seen:
+            seen.add(index)
+            result.append(index)
+    return result
+
+
+class AudioPrefetcher:
+    """Fetch neighbour audio ahead of time on worker threads
+
+    Prefetch jobs belong to a generation; every selection change starts a new
+    one and drops whatever was still queued for the old selection.  Playback
+    (the user pressed Enter) takes a file over with claim() instead of waiting.
+    If on_ready is given it is called on the worker thread with every neighbour
+    file once it is on disk, including ones that were already cached.
+    """
+
+    def __init__(self, fetch, workers=2, max_pending=16, on_ready=None):
+        self.fetch = fetch
+        self.on_ready = on_ready
+        self.max_pending = max_pending
+        self.generation = 0
+        self.queue = deque()
+        self.inflight = {}  # filename -> Future, shared by duplicate requests
+        self.cond = threading.Condition()
+        self.running = True
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self.worker, name=f"prefetch-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def update(self, words, selection, columns, audio_dir, language="ru", proxy=None):
+        """Queue the neighbours of selection, cancelling stale prefetches"""
+        indices = neighbour_indices(selection, len(words), columns)[:self.max_pending]
+        with self.cond:
+            self.generation += 1
+            self._drop_stale()
+            for index in indices:
+                text = words[index][0]
+                filename = audio_filename(audio_dir, text, language)
+                if filename in self.inflight:
+                    continue
+                if self.on_ready is None and is_cached(filename):
+                    continue
+                self._enqueue(text, language, filename, proxy, self.generation)
+            self.cond.notify_all()
+
+    def claim(self, text, audio_dir, language="ru"):
+        """Take over fetching one file; returns (future, owned)
+
+        If a worker is already downloading the file, its future is returned
+        with owned=False.  Otherwise any queued prefetch is pulled from the
+        queue and the caller owns the future: it must download the file
+        itself and finish with release().
+        """
+        filename = audio_filename(audio_dir, text, language)
+        with self.cond:
+            future = self.inflight.get(filename)
+            if future is not None:
+                for job in list(self.queue):
+                    if job[0] is future:
+                        self.queue.remove(job)
+                        break
+                else:
+                    return future, False
+            else:
+                future = self.inflight[filename] = Future()
+            future.set_running_or_notify_cancel()
+            return future, True
+
+    def release(self, future, filename, result):
+        """Complete a future obtained from claim()"""
+        with self.cond:
+            if self.inflight.get(filename) is future:
+                del self.inflight[filename]
+        future.set_result(result)
+
+    def _enqueue(self, text, language, filename, proxy, generation):
+        future = Future()
+        self.inflight[filename] = future
+        self.queue.append((future, text, language, filename, proxy, generation))
+        return future
+
+    def _drop_stale(self):
+        """Cancel queued prefetches from older generations (lock held)"""
+        kept = deque()
+        for job in self.queue:
+            future, filename, generation = job[0], job[3], job[5]
+            if generation != self.generation:
+                future.cancel()
+                self.inflight.pop(filename, None)
+            else:
+                kept.append(job)
+        self.queue = kept
+
+    def worker(self):
+        while True:
+            with self.cond:
+                while self.running and not self.queue:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                future, text, language, filename, proxy, generation = self.queue.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+            try:
+                if is_cached(filename):
+                    result = (filename, None)
+                else:
+                    result = self.fetch(text, language, filename, proxy)
+                if result[0] and self.on_ready is not None:
+                    self.on_ready(result[0])
+            except Exception as e:
+                result = (None, str(e))
+            finally:
+                with self.cond:
+                    self.inflight.pop(filename, None)
+            future.set_result(result)
+
+    def shutdown(self):
+        """Stop the workers and cancel everything still queued"""
+        with self.cond:
+            self.running = False
+            for job in self.queue:
+                job[0].cancel()
+            self.queue.clear()
+            self.inflight.clear()
+            self.cond.notify_all()
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""Shared audio store: one clip per normalized (language, text) for every level
+
+All levels read and write a single folder, words/audio_store.  Clips are
+named after a hash of their normalized key, so a word used by several
+levels, or spelled with different casing, is downloaded and kept only
+once and is available to every level as soon as it lands.  The store's
+AudioManifest is its index (file name -> text, language, size, sha1).
+
+Older versions kept a folder of ru_<word>.mp3 files per level, plus a
+top-level audio_files folder.  Those clips are shipped with the app, so
+loading a level only links them (link_legacy_audio) and reads them in
+place; adopt_legacy_audio() moves them into the store and is run only on
+request, by sync_audio.py --migrate or audio_postprocess.py LEVEL.
+"""
+import hashlib
+import json
+import os
+import unicodedata
+
+from audio_manifest import MANIFEST_NAME, get_manifest, link_clip, looks_like_mp3
+from levels import audio_store_dir, level_audio_dir
+
+LEGACY_DIR_NAME = "audio_files"
+
+
+def normalize_text(text):
+    """Key form of a word: NFC, case-folded, single spaces"""
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+def store_name(text, language):
+    """File name of a clip in the store"""
+    key = f"{language.lower()}\x00{normalize_text(text)}".encode("utf-8")
+    return f"{language}_{hashlib.sha1(key).hexdigest()[:20]}.mp3"
+
+
+def legacy_name(text, language):
+    """File name older versions used inside per-level audio folders"""
+    return f"{language}_{''.join(c if c.isalnum() else '_' for c in text)}.mp3"
+
+
+def legacy_dirs(words_dir, level):
+    """Per-level and top-level audio folders of older versions"""
+    return [level_audio_dir(words_dir, level),
+            os.path.join(os.path.dirname(os.path.abspath(words_dir)), LEGACY_DIR_NAME)]
+
+
+def _legacy_entries(legacy_dir):
+    """file name -> (text, language) from a legacy folder's manifest, if any"""
+    try:
+        with open(os.path.join(legacy_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {name: (info["text"], info["language"]) for name, info in stored.items()
+            if info.get("text") and info.get("language")}
+
+
+def _legacy_clips(legacy_dir, words):
+    """[(dir entry, (text, language))] of the clips in legacy_dir that belong to words"""
+    try:
+        listing = [entry for entry in os.scandir(legacy_dir) if entry.name.endswith(".mp3")]
+    except OSError:
+        return []
+
+    known = _legacy_entries(legacy_dir)
+    for russian, english in words:
+        known.setdefault(legacy_name(russian, "ru"), (russian, "ru"))
+        known.setdefault(legacy_name(english, "en"), (english, "en"))
+    return [(entry, known[entry.name]) for entry in listing if entry.name in known]
+
+
+def adopt_legacy(store_path, legacy_dir, words):
+    """Move clips of words out of legacy_dir into the store; returns how many were added
+
+    words are (russian, english) pairs; both ru_ and en_ clips are matched.
+    Copies the store already holds are deleted, so casing variants and
+    words shared between levels end up stored once.  The legacy folder is
+    removed when nothing but its manifest is left.
+    """
+    clips = _legacy_clips(legacy_dir, words)
+    if not clips:
+        _remove_if_empty(legacy_dir)
+        return 0
+
+    manifest = get_manifest(store_path)
+    adopted = 0
+    for entry, key in clips:
+        name = store_name(*key)
+        try:
+            if name in manifest.entries or entry.stat().st_size == 0 or not looks_like_mp3(entry.path):
+                os.remove(entry.path)
+                continue
+            target = os.path.join(store_path, name)
+            os.replace(entry.path, target)
+        except OSError as e:
+            print(f"Cannot move {entry.path} into the audio store: {e}")
+            continue
+        if manifest.record(target, *key):
+            adopted += 1
+    manifest.save()
+
+    _remove_if_empty(legacy_dir)
+    return adopted
+
+
+def _remove_if_empty(legacy_dir):
+    try:
+        names = os.listdir(legacy_dir)
+        if any(name.endswith(".mp3") for name in names):
+            return
+        for name in names:
+            if name in (MANIFEST_NAME, MANIFEST_NAME + ".tmp"):
+                os.remove(os.path.join(legacy_dir, name))
+        os.rmdir(legacy_dir)
+    except OSError:
+        pass
+
+
+def legacy_audio(words_dir, level, words):
+    """Store names of the clips adopt_legacy_audio() would add, without touching any file"""
+    manifest = get_manifest(audio_store_dir(words_dir))
+    names = set()
+    for legacy_dir in legacy_dirs(words_dir, level):
+        for entry, key in _legacy_clips(legacy_dir, words):
+            name = store_name(*key)
+            if name not in manifest.entries and entry.stat().st_size > 0 and looks_like_mp3(entry.path):
+                names.add(name)
+    return names
+
+
+def link_legacy_audio(words_dir, level, words):
+    """Let a level's legacy clips count as cached where they are; returns how many
+
+    Nothing is moved or deleted: playback reads the linked files in place.
+    """
+    linked = 0
+    for legacy_dir in legacy_dirs(words_dir, level):
+        for entry, key in _legacy_clips(legacy_dir, words):
+            try:
+                valid = entry.stat().st_size > 0 and looks_like_mp3(entry.path)
+            except OSError:
+                valid = False
+            if valid:
+                link_clip(store_name(*key), entry.path)
+                linked += 1
+    return linked
+
+
+def adopt_legacy_audio(words_dir, level, words):
+    """Fold a level's legacy audio folders into the shared store"""
+    path = audio_store_dir(words_dir)
+    adopted = 0
+    for legacy_dir in legacy_dirs(words_dir, level):
+        if os.path.isdir(legacy_dir):
+            os.makedirs(path, exist_ok=True)
+            adopted += adopt_legacy(path, legacy_dir, words)
+    if adopted:
+        print(f"Moved {adopted} audio file(s) of level {level} into {path}")
+    return adopted
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Progressive playback of audio while it is still downloading"""
+import io
+import threading
+
+from instrumentation import metrics
+
+START_BYTES = 8 * 1024  # Buffered before playback starts
+TAIL_PROBE = 512  # SDL_mixer looks for ID3v1/APE tags in this many trailing bytes
+
+
+class ProgressiveBuffer(io.RawIOBase):
+    """Growing in-memory mp3 that the mixer can read while it downloads
+
+    Reads past the buffered data block until the bytes arrive.  When the
+    total size is known, seeking to the end works immediately, and while the
+    mixer is still loading, reads of the trailing tag area return zeros
+    instead of blocking (TTS clips carry no trailing tags).  Call
+    end_probing() once the mixer has loaded the stream.
+    """
+
+    def __init__(self, total=None):
+        super().__init__()
+        self.total = total
+        self.data = bytearray()
+        self.pos = 0
+        self.complete = False
+        self.error = None
+        self.probing = True
+        self.cond = threading.Condition()
+
+    # Producer side
+
+    def feed(self, chunk):
+        with self.cond:
+            self.data += chunk
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.complete = True
+            self.total = len(self.data)
+            self.cond.notify_all()
+
+    def fail(self, error):
+        with self.cond:
+            self.error = error
+            self.complete = True
+            self.cond.notify_all()
+
+    def wait_ready(self, nbytes, timeout=None):
+        """Wait until nbytes are buffered or the download ended; False on timeout"""
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self.data) >= nbytes or self.complete, timeout)
+
+    def end_probing(self):
+        self.probing = False
+
+    # Consumer side
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_END:
+            with self.cond:
+                self.cond.wait_for(lambda: self.total is not None or self.complete)
+                offset += self.total if self.total is not None else len(self.data)
+        elif whence == io.SEEK_CUR:
+            offset += self.pos
+        self.pos = max(0, offset)
+        return self.pos
+
+    def readinto(self, b):
+        with self.cond:
+            end = self.pos + len(b)
+            if self.total is not None:
+                end = min(end, self.total)
+            if (self.probing and self.total is not None and end > len(self.data)
+                    and self.pos >= self.total - TAIL_PROBE):
+                count = max(0, end - self.pos)
+                b[:count] = bytes(count)
+                self.pos += count
+                return count
+            self.cond.wait_for(lambda: len(self.data) >= end or self.complete)
+            chunk = self.data[self.pos:end]
+        b[:len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+
+def stream_and_play(downloader, text, language, filename, proxy=None, start_bytes=START_BYTES, on_done=None):
+    """Download filename while playing it; runs on the calling (worker) thread
+
+    The clip is written to the level cache exactly as a normal download
+    would; on_done(filename, error) is called when the download ends.
+    """
+    import pygame
+
+    buffer = ProgressiveBuffer()
+    download = threading.Thread(
+        target=downloader.fetch_stream, args=(text, language, filename, buffer, proxy),
+        name="stream-download", daemon=True)
+    with metrics.span("stream.time_to_play"):
+        download.start()
+        buffer.wait_ready(start_bytes, timeout=downloader.timeout)
+
+        playing = False
+        if buffer.error is None and buffer.data:
+            try:
+                if buffer.total is not None:
+                    pygame.mixer.stop()
+                    pygame.mixer.music.load(buffer, "mp3")
+                    buffer.end_probing()
+                    pygame.mixer.music.play()
+                    playing = True
+            except pygame.error as e:
+                print(f"Streaming playback failed, waiting for the full file: {e}")
+
+    download.join()
+    result = filename if buffer.error is None else None
+    error = buffer.error
+    if result and not playing:
+        # Length unknown (or the mixer refused the stream): play the finished file
+        try:
+            pygame.mixer.stop()
+            pygame.mixer.music.load(result)
+            pygame.mixer.music.play()
+        except pygame.error as e:
+            # The clip is on disk; only playback failed
+            error = f"playback failed: {e}"
+    if on_done is not None:
+        on_done(result, error)
+    return result, error
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for the load, layout, navigation and download hot paths
+
+Generates synthetic levels as xlsx files and times each stage at every
+size, writing machine-readable results so runs can be compared:
+
+    python benchmark.py
+    python benchmark.py --sizes 100 1000 --output before.json
+    python benchmark.py --compare before.json
+
+Grid and navigation timings need a display; without one they are skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import openpyxl
+
+from audio_downloader import BulkDownloader, audio_filename, missing_audio
+from audio_manifest import get_manifest
+from tts_backends import HTTPTTS, LocalTTSServer
+from vocab_cache import load_words, read_excel_words
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+
+
+def synthetic_words(count):
+    """Deterministic pseudo-Russian words, unique per index"""
+    letters = "абвгдежзиклмнопрстуфхцчшщэюя"
+    words = []
+    for i in range(count):
+        n, word = i, ""
+        while True:
+            n, r = divmod(n, len(letters))
+            word += letters[r]
+            if not n:
+                break
+        words.append((f"сл{word}", f"word {i}"))
+    return words
+
+
+def write_level(path, words):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Words")
+    ws.append(["Russian", "English"])
+    for row in words:
+        ws.append(row)
+    wb.save(path)
+
+
+def timed(func, repeat=1):
+    """Best wall time of func over repeat runs, and its last return value"""
+    best, value = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+
+    def add(self, name, size, seconds, ops=1, **extra):
+        entry = {"name": name, "size": size, "seconds": seconds, "ops": ops,
+                 "per_op_ms": seconds / ops * 1000 if ops else None}
+        entry.update(extra)
+        self.results.append(entry)
+        print(f"{name:<28} {size:>7} words  {seconds * 1000:10.2f} ms  ({entry['per_op_ms']:.4f} ms/op)")
+
+
+def bench_load(rec, size, excel_path):
+    os.utime(excel_path)  # Invalidate any cache from a previous size
+    seconds, _ = timed(lambda: read_excel_words(excel_path))
+    rec.add("load.xlsx_parse", size, seconds)
+    seconds, _ = timed(lambda: load_words(excel_path))
+    rec.add("load.cache_build", size, seconds)
+    seconds, words = timed(lambda: load_words(excel_path), repeat=5)
+    rec.add("load.cache_hit", size, seconds)
+    return words
+
+
+def bench_grid(rec, size, words, root):
+    import tkinter as tk
+    from word_grid import VirtualWordGrid
+
+    canvas = tk.Canvas(root, width=865, height=300)
+    canvas.pack()
+    root.update()
+    grid = VirtualWordGrid(canvas, lambda index: None)
+    grid.set_columns(6)
+
+    seconds, _ = timed(lambda: (grid.set_words(words), root.update()))
+    rec.add("grid.build", size, seconds)
+
+    seconds, _ = timed(lambda: (grid.set_columns(4), grid.set_columns(6), root.update()))
+    rec.add("grid.relayout", size, seconds, ops=2)
+
+    steps = min(2000, len(words) - 1)
+
+    def navigate():
+        selection = 0
+        for _ in range(steps):
+            selection = min(len(words) - 1, selection + grid.columns)
+            grid.set_selection(selection)
+            grid.see(selection)
+            grid.render()
+        root.update()
+
+    seconds, _ = timed(navigate)
+    rec.add("grid.navigate", size, seconds, ops=steps)
+    canvas.destroy()
+
+
+def bench_lookup(rec, size, words, audio_dir):
+    texts = [russian for russian, english in words]
+    manifest = get_manifest(audio_dir)
+    names = [os.path.basename(audio_filename(audio_dir, text, "ru")) for text in texts]
+    seconds, _ = timed(lambda: [manifest.has_file(name) for name in names], repeat=3)
+    rec.add("audio.manifest_lookup", size, seconds, ops=len(names))
+    seconds, _ = timed(lambda: [os.path.exists(os.path.join(audio_dir, name)) for name in names])
+    rec.add("audio.stat_lookup", size, seconds, ops=len(names))
+    seconds, _ = timed(lambda: missing_audio(texts, audio_dir), repeat=3)
+    rec.add("audio.missing_plan", size, seconds, ops=len(texts))
+
+
+def bench_download(rec, size, words, audio_dir, limit, workers, latency):
+    texts = [russian for russian, english in words[:limit]]
+    with LocalTTSServer(latency=latency) as server:
+        downloader = BulkDownloader(workers=workers, rate=0, backends={"*": HTTPTTS(server.url_template)})
+        try:
+            seconds, result = timed(lambda: downloader.download_all(texts, audio_dir))
+        finally:
+            downloader.close()
+    rec.add("download.local_tts", size, seconds, ops=max(1, result.downloaded),
+            files=result.downloaded, failed=len(result.failed), bytes=result.bytes, workers=workers)
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for r in results:
+        old = baseline.get((r["name"], r["size"]))
+        if old and old["seconds"]:
+            print(f"{r['name']:<28} {r['size']:>7}  {r['seconds'] / old['seconds']:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark vocabulary hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic level sizes")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for results")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    parser.add_argument("--download-limit", type=int, default=500, help="max words downloaded per size")
+    parser.add_argument("--workers", type=int, default=8, help="download workers")
+    parser.add_argument("--latency", type=float, default=0.01, help="fake TTS server latency in seconds")
+    parser.add_argument("--no-gui", action="store_true", help="skip grid and navigation benchmarks")
+    args = parser.parse_args(argv)
+
+    root = None
+    if not args.no_gui:
+        try:
+            import tkinter as tk
+            root = tk.Tk()
+        except Exception as e:
+            print(f"Skipping grid benchmarks: {e}")
+
+    rec = Recorder()
+    workdir = tempfile.mkdtemp(prefix="vocab_bench_")
+    try:
+        for size in args.sizes:
+            level_dir = os.path.join(workdir, f"word_{size}")
+            audio_dir = os.path.join(level_dir, "audio_files")
+            os.makedirs(audio_dir)
+            excel_path = os.path.join(level_dir, f"word_{size}.xlsx")
+            write_level(excel_path, synthetic_words(size))
+
+            words = bench_load(rec, size, excel_path)
+            if root is not None:
+                bench_grid(rec, size, words, root)
+            bench_download(rec, size, words, audio_dir, args.download_limit, args.workers, args.latency)
+            bench_lookup(rec, size, words, audio_dir)
+    finally:
+        if root is not None:
+            root.destroy()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "sizes": args.sizes,
+        "results": rec.results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        compare(rec.results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Spaced-repetition drill scheduling with a heap of due cards and a compact review log
+
+Cards are words, identified by a 64-bit hash of their normalized Russian
+text, so a word shared by several levels is one card.  Each review appends
+one fixed-size record with the card's new state to a binary log; loading
+reads the log in chunks and later calls only read what was appended since.
+Records carry the time a card was first reviewed, so the daily limit on
+new cards holds across restarts.
+Due cards sit in a heap keyed by their next review time; rescheduling
+pushes a fresh entry and stale ones are skipped when popped.
+"""
+import hashlib
+import heapq
+import os
+import struct
+import threading
+import time
+from collections import Counter
+
+from audio_store import normalize_text
+
+LOG_MAGIC = b"RDS1"
+# card id, due, first review (unix seconds), interval (days), ease x 1000, repetitions, lapses
+LOG_RECORD = struct.Struct("<QIIfHHH")
+READ_CHUNK = 4096 * LOG_RECORD.size
+
+DAY = 86400.0
+AGAIN_DELAY = 10 * 60.0  # Seconds before a failed card comes back
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+MAX_EASE = 3.0
+
+GRADE_AGAIN = 0
+GRADE_HARD = 1
+GRADE_GOOD = 2
+GRADE_EASY = 3
+EASE_STEP = {GRADE_AGAIN: -0.2, GRADE_HARD: -0.15, GRADE_GOOD: 0.0, GRADE_EASY: 0.15}
+FIRST_INTERVAL = {GRADE_HARD: 0.5, GRADE_GOOD: 1.0, GRADE_EASY: 3.0}  # Days
+
+
+def card_id(russian):
+    digest = hashlib.sha1(normalize_text(russian).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class CardState:
+    """Scheduling state of one reviewed card"""
+
+    __slots__ = ("due", "interval", "ease", "reps", "lapses", "introduced")
+
+    def __init__(self, due=0.0, interval=0.0, ease=INITIAL_EASE, reps=0, lapses=0, introduced=0):
+        self.due = due
+        self.interval = interval
+        self.ease = ease
+        self.reps = reps
+        self.lapses = lapses
+        self.introduced = introduced  # Unix time of the first review, 0 if unknown
+
+    def review(self, grade, now):
+        """Apply an SM-2 style update for grade and return self"""
+        self.ease = min(MAX_EASE, max(MIN_EASE, self.ease + EASE_STEP[grade]))
+        if grade == GRADE_AGAIN:
+            self.reps = 0
+            self.lapses += 1
+            self.interval = AGAIN_DELAY / DAY
+        else:
+            if self.reps == 0:
+                self.interval = FIRST_INTERVAL[grade]
+            else:
+                factor = {GRADE_HARD: 1.2, GRADE_GOOD: self.ease, GRADE_EASY: self.ease * 1.3}[grade]
+                self.interval = max(self.interval * factor, self.interval + 1.0)
+            self.reps += 1
+        self.due = now + self.interval * DAY
+        return self
+
+
+def pack_state(key, state):
+    return LOG_RECORD.pack(key, int(state.due), int(state.introduced), state.interval,
+                           round(state.ease * 1000), min(state.reps, 0xFFFF), min(state.lapses, 0xFFFF))
+
+
+def unpack_states(data):
+    """(card id, CardState) for every whole record in data"""
+    for key, due, introduced, interval, ease, reps, lapses in LOG_RECORD.iter_unpack(data):
+        yield key, CardState(due, interval, ease / 1000, reps, lapses, introduced)
+
+
+class ReviewLog:
+    """Append-only binary log of card states; the last record of a card wins"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0  # Bytes of the log already read
+        self.records = 0
+        self.lock = threading.Lock()
+
+    def load_new(self, states):
+        """Read records appended since the last call into states (card id -> CardState)"""
+        with self.lock:
+            try:
+                f = open(self.path, "rb")
+            except FileNotFoundError:
+                return 0
+            count = 0
+            with f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    self.offset = 0  # Compacted by another instance: read it all again
+                if self.offset == 0:
+                    if f.read(len(LOG_MAGIC)) != LOG_MAGIC:
+                        f.close()
+                        self._set_aside()
+                        return 0
+                    self.offset = len(LOG_MAGIC)
+                    self.records = 0
+                f.seek(self.offset)
+                while True:
+                    chunk = f.read(READ_CHUNK)
+                    usable = len(chunk) - len(chunk) % LOG_RECORD.size  # A torn last record is skipped
+                    states.update(unpack_states(chunk[:usable]))
+                    count += usable // LOG_RECORD.size
+                    self.offset += usable
+                    if len(chunk) < READ_CHUNK:
+                        break
+            self.records += count
+            return count
+
+    def _set_aside(self):
+        """Move an unreadable log out of the way so new reviews are not appended to it"""
+        aside = self.path + ".unknown"
+        print(f"Unknown review log format, moving {self.path} to {aside}")
+        try:
+            os.replace(self.path, aside)
+        except OSError as e:
+            print(f"Cannot move {self.path}: {e}")
+
+    def append(self, key, state):
+        if self.offset == 0 and os.path.exists(self.path):
+            self.load_new({})  # Check the format before adding to a log not read yet
+        record = pack_state(key, state)
+        with self.lock:
+            new = not os.path.exists(self.path)
+            with open(self.path, "ab") as f:
+                if new:
+                    f.write(LOG_MAGIC)
+                    self.offset = len(LOG_MAGIC)
+                f.write(record)
+            self.offset += len(record)
+            self.records += 1
+
+    def compact(self, states):
+        """Rewrite the log with one record per card"""
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(LOG_MAGIC)
+                for key, state in states.items():
+                    f.write(pack_state(key, state))
+            os.replace(tmp_path, self.path)
+            self.offset = len(LOG_MAGIC) + len(states) * LOG_RECORD.size
+            self.records = len(states)
+
+
+class DrillScheduler:
+    """Pick the next card to review across any number of levels
+
+    Reviewed cards wait in a heap ordered by due time; cards never seen
+    before are introduced in level order, at most new_per_day of them per
+    calendar day, counted from the first review times in the log.
+    """
+
+    def __init__(self, log_path, new_per_day=20, clock=time.time):
+        self.log = ReviewLog(log_path)
+        self.clock = clock
+        self.new_per_day = new_per_day
+        self.states = {}  # card id -> CardState
+        self.cards = {}  # card id -> (level, russian, english)
+        self.heap = []  # (due, card id)
+        self.new_cards = []  # card ids never reviewed, in level order
+        self.new_seen = set()
+        self.introduced = Counter()  # local date -> cards first reviewed that day
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Read the review log; cheap on later calls, which only read new records"""
+        states = {}
+        self.log.load_new(states)
+        with self.lock:
+            for key, state in states.items():
+                old = self.states.get(key)
+                if old is not None and old.introduced:
+                    self.introduced[self._day(old.introduced)] -= 1
+                if state.introduced:
+                    self.introduced[self._day(state.introduced)] += 1
+            self.states.update(states)
+            for key, state in states.items():
+                if key in self.cards:
+                    heapq.heappush(self.heap, (state.due, key))
+            if any(key in self.new_seen for key in states):
+                # Levels added before the log was read: reviewed cards are no longer new
+                self.new_cards = [key for key in self.new_cards if key not in self.states]
+        if self.log.records > 2 * max(len(self.states), 1000):
+            self.log.compact(dict(self.states))
+
+    def add_level(self, level, words):
+        """Make a level's words drillable; words already known keep their first level"""
+        with self.lock:
+            due = []
+            for russian, english in words:
+                key = card_id(russian)
+                if key in self.cards:
+                    continue
+                self.cards[key] = (level, russian, english)
+                state = self.states.get(key)
+                if state is not None:
+                    due.append((state.due, key))
+                elif key not in self.new_seen:
+                    self.new_seen.add(key)
+                    self.new_cards.append(key)
+            if len(due) > len(self.heap):
+                self.heap.extend(due)
+                heapq.heapify(self.heap)
+            else:
+                for entry in due:
+                    heapq.heappush(self.heap, entry)
+
+    def _valid(self, entry):
+        due, key = entry
+        state = self.states.get(key)
+        return state is not None and state.due == due
+
+    @staticmethod
+    def _day(timestamp):
+        return time.localtime(timestamp)[:3]
+
+    def _new_room(self, now):
+        """New cards that may still be introduced today"""
+        return max(0, self.new_per_day - self.introduced[self._day(now)])
+
+    def upcoming(self, count):
+        """The next count cards in review order, without removing them"""
+        now = self.clock()
+        with self.lock:
+            taken = []
+            result = []
+            while self.heap and len(result) < count:
+                entry = heapq.heappop(self.heap)
+                if not self._valid(entry) or entry[1] in result:
+                    continue
+                taken.append(entry)
+                if entry[0] <= now:
+                    result.append(entry[1])
+                else:
+                    break
+            for entry in taken:
+                heapq.heappush(self.heap, entry)
+            room = min(count - len(result), self._new_room(now))
+            result.extend(self.new_cards[:room])
+            return [(key,) + self.cards[key] for key in result]
+
+    def next_card(self):
+        """(card id, level, russian, english) of the card to review now, or None"""
+        upcoming = self.upcoming(1)
+        return upcoming[0] if upcoming else None
+
+    def counts(self):
+        """(due now, new available today)"""
+        now = self.clock()
+        with self.lock:
+            # Walk only the part of the heap that is due: children are never due earlier
+            due = 0
+            stack = [0]
+            while stack:
+                i = stack.pop()
+                if i < len(self.heap) and self.heap[i][0] <= now:
+                    due += self._valid(self.heap[i])
+                    stack += (2 * i + 1, 2 * i + 2)
+            new = min(len(self.new_cards), self._new_room(now))
+            return due, new
+
+    def next_due(self):
+        """Unix time of the earliest scheduled review, or None"""
+        with self.lock:
+            while self.heap and not self._valid(self.heap[0]):
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def review(self, key, grade):
+        """Record a review of card key and reschedule it"""
+        now = self.clock()
+        with self.lock:
+            state = self.states.get(key)
+            if state is None:
+                state = self.states[key] = CardState(introduced=int(now))
+                self.introduced[self._day(now)] += 1
+                if key in self.new_seen:
+                    self.new_cards.remove(key)
+            state.review(grade, now)
+            # Stored due times are whole seconds; keep the heap key identical
+            state.due = float(int(state.due))
+            heapq.heappush(self.heap, (state.due, key))
+            if len(self.heap) > 2 * len(self.cards) + 64:
+                self.heap = [entry for entry in self.heap if self._valid(entry)]
+                heapq.heapify(self.heap)
+        self.log.append(key, state)
+        return state
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Timing spans, counters and optional cProfile capture for the hot paths
+
+Everything records into the shared `metrics` object:
+
+    with metrics.span("load_level_data", level=level):
+        ...
+    metrics.count("sound_cache.hit")
+
+Set RUSSIAN_VOCAB_METRICS=<file.json|file.csv> to export on exit and
+RUSSIAN_VOCAB_PROFILE=<file.prof> to capture a cProfile of the session;
+the app also accepts --metrics and --profile for the same.
+"""
+import csv
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+METRICS_ENV = "RUSSIAN_VOCAB_METRICS"
+PROFILE_ENV = "RUSSIAN_VOCAB_PROFILE"
+
+
+class Span:
+    """Handle returned by Metrics.span; seconds is set when the block exits"""
+
+    def __init__(self, name, tags):
+        self.name = name
+        self.tags = tags
+        self.seconds = None
+
+    @property
+    def ms(self):
+        return self.seconds * 1000 if self.seconds is not None else None
+
+
+class _SpanContext:
+    def __init__(self, metrics, name, tags):
+        self.metrics = metrics
+        self.span = Span(name, tags)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.seconds = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.span.tags["error"] = exc_type.__name__
+        self.metrics.record(self.span.name, self.span.seconds, **self.span.tags)
+        return False
+
+
+class Metrics:
+    """Thread-safe store of timed events plus per-name aggregates"""
+
+    def __init__(self, max_events=50000):
+        self.events = deque(maxlen=max_events)  # (wall time, name, seconds, tags)
+        self.totals = {}  # name -> [count, total seconds, max seconds]
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def span(self, name, **tags):
+        """Context manager timing the enclosed block"""
+        return _SpanContext(self, name, tags)
+
+    def timed(self, name=None):
+        """Decorator form of span"""
+        def decorator(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds, **tags):
+        with self.lock:
+            self.events.append((time.time(), name, seconds, tags))
+            total = self.totals.get(name)
+            if total is None:
+                self.totals[name] = [1, seconds, seconds]
+            else:
+                total[0] += 1
+                total[1] += seconds
+                total[2] = max(total[2], seconds)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        """Per-span aggregates, slowest total first"""
+        with self.lock:
+            rows = [
+                {"name": name, "count": count, "total_ms": total * 1000,
+                 "mean_ms": total / count * 1000, "max_ms": longest * 1000}
+                for name, (count, total, longest) in self.totals.items()
+            ]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def export(self, path):
+        """Write events, aggregates and counters as JSON, or events as CSV"""
+        with self.lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(["timestamp", "name", "ms", "tags"])
+                for timestamp, name, seconds, tags in events:
+                    writer.writerow([f"{timestamp:.6f}", name, f"{seconds * 1000:.3f}",
+                                     json.dumps(tags, ensure_ascii=False, default=str)])
+                for name, value in counters.items():
+                    writer.writerow(["", name, "", json.dumps({"count": value})])
+        else:
+            data = {
+                "summary": self.summary(),
+                "counters": counters,
+                "events": [
+                    {"timestamp": timestamp, "name": name, "ms": seconds * 1000, "tags": tags}
+                    for timestamp, name, seconds, tags in events
+                ],
+            }
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1, ensure_ascii=False, default=str)
+
+    def print_summary(self, limit=15):
+        for row in self.summary()[:limit]:
+            print(f"{row['name']:<32} n={row['count']:<6} total={row['total_ms']:9.1f} ms "
+                  f"mean={row['mean_ms']:8.2f} ms max={row['max_ms']:8.2f} ms")
+        for name, value in sorted(self.counters.items()):
+            print(f"{name:<32} {value}")
+
+
+metrics = Metrics()
+
+
+class Profiler:
+    """cProfile capture written to a file when stopped"""
+
+    def __init__(self, path):
+        import cProfile
+
+        self.path = path
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        self.profile.disable()
+        self.profile.dump_stats(self.path)
+        print(f"Profile written to {self.path}")
+
+
+def start_profiler(path=None):
+    """Start profiling if a path is given or set in the environment"""
+    path = path or os.environ.get(PROFILE_ENV)
+    if not path:
+        return None
+    return Profiler(path).start()
+
+
+def metrics_path(path=None):
+    return path or os.environ.get(METRICS_ENV)
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""In-memory store of loaded levels with lazy setup and background preloading"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from levels import LEVELS, level_dir, level_excel_path, audio_store_dir
+from audio_store import link_legacy_audio
+from audio_bundle import mount_levels
+from vocab_cache import load_words
+from instrumentation import metrics
+
+
+class LevelStore:
+    """Load each level on first use and keep it; preload neighbours off-thread
+
+    A level's folders and spreadsheet are only created when that level is
+    first needed.  Entries remember the xlsx stat they were loaded from, so
+    an edited sheet is reloaded on the next get() instead of served stale.
+    """
+
+    def __init__(self, words_dir, levels=LEVELS, create_excel=None, on_load=None):
+        self.words_dir = words_dir
+        self.levels = list(levels)
+        self.create_excel = create_excel
+        self.on_load = on_load  # Called as on_load(level, words) on the loading thread
+        self.entries = {}  # level -> ((mtime_ns, size), words)
+        self.pending = {}  # level -> Future of a background load
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-preload")
+        # Packed audio of every level; clips in them count as downloaded
+        mount_levels(words_dir, self.levels)
+
+    def ensure_level(self, level):
+        """Create the level's folder, the shared audio folder and the spreadsheet if missing"""
+        os.makedirs(level_dir(self.words_dir, level), exist_ok=True)
+        os.makedirs(audio_store_dir(self.words_dir), exist_ok=True)
+        excel_path = level_excel_path(self.words_dir, level)
+        if not os.path.exists(excel_path) and self.create_excel is not None:
+            self.create_excel(level, excel_path)
+        return excel_path
+
+    def is_loaded(self, level):
+        return level in self.entries
+
+    def get(self, level):
+        """Words for level, from memory when the spreadsheet is unchanged"""
+        with self.lock:
+            future = self.pending.get(level)
+        if future is not None:
+            future.result()
+
+        excel_path = self.ensure_level(level)
+        stat = os.stat(excel_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        entry = self.entries.get(level)
+        if entry is not None and entry[0] == key:
+            metrics.count("level_store.hit")
+            return entry[1]
+
+        metrics.count("level_store.miss")
+        return self._load(level, excel_path, key)
+
+    def _load(self, level, excel_path, key):
+        with metrics.span("level_store.load", level=level):
+            words = load_words(excel_path)
+            link_legacy_audio(self.words_dir, level, words)
+        with self.lock:
+            self.entries[level] = (key, words)
+        if self.on_load is not None:
+            self.on_load(level, words)
+        return words
+
+    def _preload(self, level):
+        try:
+            excel_path = self.ensure_level(level)
+            stat = os.stat(excel_path)
+            self._load(level, excel_path, (stat.st_mtime_ns, stat.st_size))
+        except Exception as e:
+            print(f"Preloading level {level} failed: {e}")
+        finally:
+            with self.lock:
+                self.pending.pop(level, None)
+
+    def neighbours(self, level):
+        """Levels adjacent to level in difficulty order"""
+        index = self.levels.index(level)
+        return [self.levels[i] for i in (index + 1, index - 1) if 0 <= i < len(self.levels)]
+
+    def preload(self, levels):
+        """Load levels on the background thread unless already loaded or queued"""
+        with self.lock:
+            for level in levels:
+                if level not in self.entries and level not in self.pending:
+                    self.pending[level] = self.executor.submit(self._preload, level)
+
+    def invalidate(self, level):
+        with self.lock:
+            self.entries.pop(level, None)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Level names and on-disk layout, usable without tkinter or pygame"""
+import os
+import sys
+
+LEVELS = ["A1", "A2", "B1", "B2", "C1", "C2"]
+
+
+def resource_path(relative_path):
+    """Get path relative to exe or script folder"""
+    if hasattr(sys, "_MEIPASS"):
+        return os.path.join(sys._MEIPASS, relative_path)
+    return os.path.join(os.path.abspath("."), relative_path)
+
+
+def level_dir(words_dir, level):
+    return os.path.join(words_dir, f"word_{level}")
+
+
+def level_excel_path(words_dir, level):
+    return os.path.join(level_dir(words_dir, level), f"word_{level}.xlsx")
+
+
+def level_bundle_path(words_dir, level):
+    """Packed audio of a level, see audio_bundle"""
+    return os.path.join(level_dir(words_dir, level), f"word_{level}.audiopack")
+
+
+def audio_store_dir(words_dir):
+    """Folder holding the audio clips shared by every level"""
+    return os.path.join(words_dir, "audio_store")
+
+
+def level_audio_dir(words_dir, level):
+    """Per-level audio folder of older versions, read in place until migrated"""
+    return os.path.join(level_dir(words_dir, level), "audio_files")
+
+
+def drill_log_path(words_dir):
+    """Review history of the drill mode, see drill_scheduler"""
+    return os.path.join(words_dir, "drill_reviews.log")
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Headless batch audio sync for one or more levels
+
+Examples:
+    python sync_audio.py --all
+    python sync_audio.py A1 B1 --workers 16 --proxy http://127.0.0.1:7890
+    python sync_audio.py C1 --dry-run
+    python sync_audio.py --all --verify
+    python sync_audio.py B2 --backend offline
+    python sync_audio.py B2 --backend ru=http --tts-url "http://host/tts?tl={language}&q={text}"
+    python sync_audio.py --all --process --bitrate 32k
+    python sync_audio.py --all --migrate
+"""
+import argparse
+import os
+import sys
+import time
+
+from levels import LEVELS, resource_path, level_excel_path, audio_store_dir
+from vocab_cache import load_words
+from audio_downloader import BulkDownloader, audio_filename, missing_audio
+from audio_store import adopt_legacy_audio, legacy_audio, link_legacy_audio
+from audio_bundle import mount_levels
+from audio_manifest import get_manifest
+from audio_postprocess import find_ffmpeg, process_dir
+from tts_backends import HTTPTTS, available_backends, get_backend
+from instrumentation import metrics, metrics_path
+
+
+def plan_level(words_dir, level, language, dry_run=False, migrate=False):
+    """Return (total words, [(text, language, filename)]) still missing for level
+
+    Clips in legacy audio folders count as present and are left in place.
+    With migrate they are moved into the store first; with dry_run nothing
+    is moved and the clips that would be are only reported.
+    """
+    excel_path = level_excel_path(words_dir, level)
+    if not os.path.exists(excel_path):
+        print(f"Skipping level {level}: {excel_path} not found")
+        return 0, []
+    audio_dir = audio_store_dir(words_dir)
+    words = load_words(excel_path)
+    if dry_run:
+        adoptable = legacy_audio(words_dir, level, words) if migrate else ()
+        if adoptable:
+            print(f"Level {level}: {len(adoptable)} clip(s) would be moved in from legacy audio folders")
+    else:
+        os.makedirs(audio_dir, exist_ok=True)
+        if migrate:
+            adopt_legacy_audio(words_dir, level, words)
+    link_legacy_audio(words_dir, level, words)
+    texts = [russian for russian, english in words]
+    jobs = [(text, language, audio_filename(audio_dir, text, language))
+            for text in missing_audio(texts, audio_dir, language)]
+    return len(texts), jobs
+
+
+def process_new_clips(args):
+    """Post-process clips that are new or changed since the last run"""
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        print("Skipping --process: ffmpeg not found")
+        return 2
+    result = process_dir(audio_store_dir(args.words_dir), ffmpeg, {"bitrate": args.bitrate},
+                         workers=args.workers, keep_originals=args.keep_originals)
+    for name, error in result.failed:
+        print(f"Processing failed: {name} ({error})")
+    print(f"Processed {result.processed} clip(s) in {result.elapsed:.1f}s, "
+          f"{(result.bytes_before - result.bytes_after) / 1024:.1f} KiB saved")
+    return 1 if result.failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Download missing audio for vocabulary levels")
+    parser.add_argument("levels", nargs="*", metavar="LEVEL", help=f"levels to sync ({', '.join(LEVELS)})")
+    parser.add_argument("--all", action="store_true", help="sync every level")
+    parser.add_argument("--words-dir", default=resource_path("words"), help="root of the word_<level> folders")
+    parser.add_argument("--language", default="ru", help="TTS language of the first column")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent downloads")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second per host (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=4, help="retries on 429/5xx and network errors")
+    parser.add_argument("--proxy", default=None, help="HTTP(S) proxy URL")
+    parser.add_argument("--backend", action="append", default=[], metavar="[LANG=]NAME",
+                        help=f"TTS backend for all or one language ({', '.join(available_backends())})")
+    parser.add_argument("--tts-url", default=None,
+                        help="URL template for the http backend, with {language} and {text}")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be fetched and exit")
+    parser.add_argument("--migrate", action="store_true",
+                        help="move clips from legacy per-level audio folders into the shared store")
+    parser.add_argument("--verify", action="store_true",
+                        help="re-hash every stored clip first; corrupt ones are deleted and fetched again")
+    parser.add_argument("--metrics", metavar="FILE", default=None,
+                        help="export per-request timing spans (.json or .csv)")
+    parser.add_argument("--process", action="store_true",
+                        help="trim, normalize and re-encode new clips afterwards (needs ffmpeg)")
+    parser.add_argument("--bitrate", default=None, help="with --process, re-encode at this bitrate, e.g. 32k")
+    parser.add_argument("--keep-originals", action="store_true",
+                        help="with --process, keep an unprocessed copy of each clip to encode later runs from")
+    args = parser.parse_args(argv)
+
+    levels = list(LEVELS) if args.all or not args.levels else args.levels
+    unknown = [level for level in levels if level not in LEVELS]
+    if unknown:
+        parser.error(f"unknown level(s): {', '.join(unknown)}")
+    args.levels = levels
+
+    backends = {}
+    for value in args.backend:
+        language, _, name = value.rpartition("=")
+        if name == HTTPTTS.name:
+            if not args.tts_url:
+                parser.error("the http backend needs --tts-url")
+            backend = HTTPTTS(args.tts_url)
+        else:
+            try:
+                backend = get_backend(name)
+            except ValueError as e:
+                parser.error(str(e))
+        backends[language or "*"] = backend
+    args.backends = backends
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mount_levels(args.words_dir, LEVELS)
+    if args.verify:
+        audio_dir = audio_store_dir(args.words_dir)
+        with metrics.span("verify"):
+            bad = get_manifest(audio_dir).verify(repair=not args.dry_run)
+        for name in bad:
+            print(f"Corrupt: {name}")
+        print(f"Verified {audio_dir}: {len(bad)} corrupt clip(s)"
+              + (" would be fetched again" if args.dry_run and bad else ""))
+
+    jobs = []
+    total_words = 0
+    planned = set()
+    for level in args.levels:
+        count, level_jobs = plan_level(args.words_dir, level, args.language,
+                                       dry_run=args.dry_run, migrate=args.migrate)
+        # Levels share one store, so a word in several levels is fetched once
+        level_jobs = [job for job in level_jobs if job[2] not in planned]
+        planned.update(job[2] for job in level_jobs)
+        print(f"Level {level}: {count} words, {len(level_jobs)} missing")
+        if args.dry_run:
+            for text, language, filename in level_jobs:
+                print(f"  {language} {text} -> {filename}")
+        total_words += count
+        jobs.extend(level_jobs)
+
+    if args.dry_run or not jobs:
+        print(f"{len(jobs)} file(s) to download")
+        if args.process and not args.dry_run:
+            return process_new_clips(args)
+        return 0
+
+    last_report = [0.0]
+
+    def progress(done, total, result):
+        now = time.monotonic()
+        if now - last_report[0] >= 1.0 or done == total:
+            last_report[0] = now
+            print(f"{done}/{total} ({result.downloaded} new, {len(result.failed)} failed)", file=sys.stderr)
+
+    downloader = BulkDownloader(workers=args.workers, rate=args.rate, retries=args.retries,
+                                backends=args.backends)
+    try:
+        result = downloader.download_many(jobs, total=total_words, proxy=args.proxy, progress=progress)
+    finally:
+        downloader.close()
+    status = 1 if result.failed else 0
+    if args.process:
+        status = max(status, process_new_clips(args))
+
+    export_path = metrics_path(args.metrics)
+    if export_path:
+        metrics.export(export_path)
+        print(f"Metrics written to {export_path}")
+
+    for text, error in result.failed:
+        print(f"Failed: {text} ({error})")
+    print(f"Downloaded {result.downloaded} file(s), {result.bytes / 1024:.1f} KiB in {result.elapsed:.1f}s "
+          f"({result.files_per_second:.1f} files/s, {result.bytes_per_second / 1024:.1f} KiB/s), "
+          f"{result.cached} already cached, {len(result.failed)} failed")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from async_downloader import AsyncDownloadEngine
+from audio_downloader import BulkDownloader, audio_filename, missing_audio
+from tts_backends import HTTPTTS, LocalTTSServer, OfflineTTS
+
+TEXTS = [f"слово {i}" for i in range(20)]
+
+
+class RecordingTTS(OfflineTTS):
+    """OfflineTTS that records the order texts were synthesized in"""
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.order = []
+        self.lock = threading.Lock()
+
+    def synthesize(self, session, text, language, timeout=30, proxies=None):
+        with self.lock:
+            self.order.append(text)
+        return super().synthesize(session, text, language, timeout, proxies)
+
+
+def make_engine(backend, concurrency=4, **options):
+    downloader = BulkDownloader(workers=concurrency, rate=0, retries=8, backoff=0.001, backends={"*": backend})
+    return AsyncDownloadEngine(downloader, concurrency=concurrency, **options)
+
+
+@pytest.fixture
+def engines():
+    started = []
+
+    def start(*args, **options):
+        started.append(make_engine(*args, **options))
+        return started[-1]
+
+    yield start
+    for engine in started:
+        engine.shutdown()
+
+
+def test_bulk_job_retries_and_completes(tmp_path, engines):
+    with LocalTTSServer(error_rate=0.3) as server:
+        engine = engines(HTTPTTS(server.url_template))
+        progress = []
+        job = engine.submit_bulk("A1", str(tmp_path), TEXTS,
+                                 progress=lambda done, total, result: progress.append(done))
+        result = job.future.result(30)
+    assert (result.downloaded, result.failed, result.cancelled) == (len(TEXTS), [], False)
+    assert server.requests > len(TEXTS)
+    assert progress[-1] == len(TEXTS)
+    assert missing_audio(TEXTS, str(tmp_path)) == []
+
+    again = engine.submit_bulk("A1", str(tmp_path), TEXTS).future.result(5)
+    assert (again.cached, again.downloaded) == (len(TEXTS), 0)
+
+
+def test_cancel_stops_a_bulk_job(tmp_path, engines):
+    backend = RecordingTTS(latency=0.1)
+    engine = engines(backend, concurrency=2, prefetch_reserve=0)
+    first = threading.Event()
+    job = engine.submit_bulk("A1", str(tmp_path), TEXTS, progress=lambda done, total, result: done and first.set())
+    assert first.wait(5)
+    job.cancel()
+    result = job.future.result(2)
+    assert result.cancelled
+    assert 0 < result.downloaded < len(TEXTS)
+    assert result.failed == []
+    assert len(backend.order) < len(TEXTS)
+
+
+def test_prefetch_goes_ahead_of_queued_bulk_work(tmp_path, engines):
+    backend = RecordingTTS(latency=0.05)
+    engine = engines(backend, concurrency=1)
+    job = engine.submit_bulk("A1", str(tmp_path), TEXTS[:5])
+    filename = audio_filename(str(tmp_path), "срочно", "ru")
+    assert engine.submit("срочно", "ru", filename).result(5) == (filename, None)
+    job.future.result(5)
+    assert backend.order.index("срочно") <= 1  # At most the bulk item already running went first
+
+
+def test_reserved_worker_serves_prefetch_during_bulk(tmp_path, engines):
+    backend = RecordingTTS(latency=0.1)
+    engine = engines(backend, concurrency=2, prefetch_reserve=1)
+    job = engine.submit_bulk("A1", str(tmp_path), TEXTS)
+    filename = audio_filename(str(tmp_path), "срочно", "ru")
+    assert engine.fetch("срочно", "ru", filename) == (filename, None)
+    assert not job.done()  # Served while one worker still walks the bulk queue
+    job.cancel()
+    job.future.result(2)
+
+
+def test_job_that_cannot_start_fails(tmp_path, engines):
+    engine = engines(OfflineTTS())
+    job = engine.submit_bulk("A1", str(tmp_path), ["да", None])
+    with pytest.raises(TypeError):
+        job.future.result(5)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from audio_bundle import AudioBundle, bundled, mount, read_clip, unmount, write_bundle
+
+CLIPS = [
+    ("ru_0001.mp3", "привет", b"\xff\xfb" + b"a" * 100),
+    ("en_0002.mp3", "Hello, world", b"ID3" + b"b" * 7),
+    ("ru_0003.mp3", "ёжик", b"\xff\xf3"),
+]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "word_A1.audiopack")
+    size = write_bundle(path, CLIPS)
+    assert size == (tmp_path / "word_A1.audiopack").stat().st_size
+
+    bundle = AudioBundle(path)
+    try:
+        assert len(bundle) == len(CLIPS)
+        for name, text, data in CLIPS:
+            assert name in bundle
+            assert bytes(bundle.read(name)) == data
+            assert bundle.texts[name] == text
+        assert bundle.read("ru_missing.mp3") is None
+    finally:
+        bundle.close()
+
+
+def test_empty_bundle(tmp_path):
+    path = str(tmp_path / "empty.audiopack")
+    write_bundle(path, [])
+    bundle = AudioBundle(path)
+    assert len(bundle) == 0
+    bundle.close()
+
+
+def test_damaged_bundle_is_rejected(tmp_path):
+    path = tmp_path / "word_A1.audiopack"
+    write_bundle(str(path), CLIPS)
+    data = path.read_bytes()
+
+    path.write_bytes(data[:-1])
+    with pytest.raises(ValueError):
+        AudioBundle(str(path))
+    path.write_bytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError):
+        AudioBundle(str(path))
+    path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        AudioBundle(str(path))
+
+
+def test_mount_and_unmount(tmp_path):
+    path = str(tmp_path / "word_A1.audiopack")
+    write_bundle(path, CLIPS)
+    assert mount(path) is not None
+    try:
+        assert bundled("ru_0001.mp3")
+        assert bytes(read_clip("en_0002.mp3")) == CLIPS[1][2]
+    finally:
+        unmount(path)
+    assert not bundled("ru_0001.mp3")
+    assert read_clip("ru_0001.mp3") is None
+    assert mount(str(tmp_path / "missing.audiopack")) is None
+
+
+def test_remount_after_repack(tmp_path):
+    path = str(tmp_path / "word_A1.audiopack")
+    write_bundle(path, CLIPS[:1])
+    mount(path)
+    try:
+        unmount(path)
+        write_bundle(path, CLIPS[1:])
+        mount(path)
+        assert not bundled("ru_0001.mp3")
+        assert bundled("ru_0003.mp3")
+    finally:
+        unmount(path)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+
+import pytest
+
+from audio_downloader import BulkDownloader, RateLimiter, audio_filename, missing_audio
+from audio_manifest import get_manifest
+from tts_backends import HTTPTTS, LocalTTSServer, OfflineTTS, TTSBackend, TTSError, synthesize_offline
+
+TEXTS = [f"слово {i}" for i in range(30)]
+
+
+class ScriptedTTS(TTSBackend):
+    """Fails with the queued errors first, then answers like OfflineTTS"""
+
+    name = "scripted"
+
+    def __init__(self, errors, host="tts.test"):
+        self.errors = list(errors)
+        self.host = host
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def rate_key(self):
+        return self.host
+
+    def synthesize(self, session, text, language, timeout=30, proxies=None):
+        with self.lock:
+            self.calls.append(time.monotonic())
+            error = self.errors.pop(0) if self.errors else None
+        if isinstance(error, bytes):
+            return error
+        if error is not None:
+            raise error
+        return synthesize_offline(text, language)
+
+
+@pytest.fixture
+def server():
+    with LocalTTSServer(error_rate=0.3) as server:
+        yield server
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    limiter = RateLimiter(100)
+    delays = [limiter.reserve("a") for _ in range(5)]
+    assert delays[0] == 0
+    assert delays == sorted(delays)
+    assert delays[4] == pytest.approx(0.04, abs=0.005)
+    assert limiter.reserve("b") == 0
+    assert RateLimiter(0).reserve("a") == 0
+    assert limiter.reserve(None) == 0
+
+
+def test_rate_limiter_penalty_pushes_back_the_host():
+    limiter = RateLimiter(1000)
+    limiter.penalize("a", 0.5)
+    assert limiter.reserve("a") == pytest.approx(0.5, abs=0.05)
+    assert limiter.reserve("b") == 0
+
+    unlimited = RateLimiter(0)
+    unlimited.penalize("a", 0.5)
+    assert unlimited.reserve("a") == pytest.approx(0.5, abs=0.05)
+    assert unlimited.reserve("b") == 0
+
+
+def test_bulk_download_retries_server_errors(tmp_path, server):
+    downloader = BulkDownloader(workers=8, rate=0, retries=8, backoff=0.001,
+                                backends={"*": HTTPTTS(server.url_template)})
+    try:
+        result = downloader.download_all(TEXTS, str(tmp_path))
+    finally:
+        downloader.close()
+    assert result.failed == []
+    assert result.downloaded == len(TEXTS)
+    assert server.requests > len(TEXTS)  # Some requests were answered 503 and retried
+    assert missing_audio(TEXTS, str(tmp_path)) == []
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_cached_files_are_not_fetched_again(tmp_path):
+    downloader = BulkDownloader(workers=4, rate=0, backends={"*": OfflineTTS()})
+    downloader.download_all(TEXTS[:10], str(tmp_path))
+    result = downloader.download_all(TEXTS, str(tmp_path))
+    assert (result.cached, result.downloaded) == (10, len(TEXTS) - 10)
+
+
+def test_429_waits_for_retry_after_and_slows_the_host(tmp_path):
+    backend = ScriptedTTS([TTSError("Status: 429", 429, retry_after=0.2)])
+    downloader = BulkDownloader(rate=0, retries=2, backends={"*": backend})
+    filename = audio_filename(str(tmp_path), "да", "ru")
+    assert downloader.fetch("да", "ru", filename) == (filename, None)
+    assert len(backend.calls) == 2
+    assert backend.calls[1] - backend.calls[0] >= 0.2
+    # Every other request to the host was pushed back too
+    assert downloader.limiter._next_slot["tts.test"] >= backend.calls[0] + 0.2
+
+
+def test_permanent_errors_are_not_retried(tmp_path):
+    backend = ScriptedTTS([TTSError("Status: 404", 404)])
+    downloader = BulkDownloader(rate=0, retries=3, backoff=0.001, backends={"*": backend})
+    filename = audio_filename(str(tmp_path), "да", "ru")
+    assert downloader.fetch("да", "ru", filename) == (None, "Status: 404")
+    assert len(backend.calls) == 1
+
+
+def test_retries_give_up_with_the_last_error(tmp_path):
+    backend = ScriptedTTS([TTSError("timed out")] * 2 + [b"<html>busy</html>"] * 2)
+    downloader = BulkDownloader(rate=0, retries=3, backoff=0.001, backends={"*": backend})
+    filename = audio_filename(str(tmp_path), "да", "ru")
+    assert downloader.fetch("да", "ru", filename) == (None, "Invalid audio data")
+    assert len(backend.calls) == 4
+    assert not get_manifest(str(tmp_path)).has_file(os.path.basename(filename))
+    assert not [name for name in os.listdir(tmp_path) if ".mp3" in name]
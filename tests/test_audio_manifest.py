@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import os
+
+from audio_manifest import MANIFEST_NAME, AudioManifest
+
+MP3 = b"\xff\xfb" + b"a" * 64
+OTHER = b"\xff\xfb" + b"b" * 64
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def recorded(tmp_path, name="ru_a.mp3", data=MP3):
+    manifest = AudioManifest(str(tmp_path))
+    assert manifest.record(write(tmp_path / name, data), "привет", "ru")
+    manifest.save()
+    return manifest
+
+
+def test_record_survives_reload(tmp_path):
+    recorded(tmp_path)
+    assert (tmp_path / MANIFEST_NAME).exists()
+    manifest = AudioManifest(str(tmp_path))
+    assert manifest.has_file("ru_a.mp3")
+    assert not manifest.has_file("ru_b.mp3")
+    assert manifest.entries["ru_a.mp3"]["text"] == "привет"
+
+
+def test_invalid_download_is_not_recorded(tmp_path):
+    manifest = AudioManifest(str(tmp_path))
+    assert not manifest.record(write(tmp_path / "ru_a.mp3", b"<html>error</html>"), "a", "ru")
+    assert not (tmp_path / "ru_a.mp3").exists()
+    assert not manifest.has_file("ru_a.mp3")
+
+
+def test_truncated_file_is_removed(tmp_path):
+    recorded(tmp_path)
+    write(tmp_path / "ru_a.mp3", MP3[:10])
+    manifest = AudioManifest(str(tmp_path))
+    assert not manifest.has_file("ru_a.mp3")
+    assert not (tmp_path / "ru_a.mp3").exists()
+    assert "ru_a.mp3" not in AudioManifest(str(tmp_path)).entries
+
+
+def test_emptied_file_is_removed(tmp_path):
+    recorded(tmp_path)
+    write(tmp_path / "ru_a.mp3", b"")
+    assert not AudioManifest(str(tmp_path)).has_file("ru_a.mp3")
+    assert not (tmp_path / "ru_a.mp3").exists()
+
+
+def test_changed_content_of_same_size_is_removed(tmp_path):
+    recorded(tmp_path)
+    path = write(tmp_path / "ru_a.mp3", OTHER)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not AudioManifest(str(tmp_path)).has_file("ru_a.mp3")
+    assert not os.path.exists(path)
+
+
+def test_touched_file_is_kept(tmp_path):
+    recorded(tmp_path)
+    path = str(tmp_path / "ru_a.mp3")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    manifest = AudioManifest(str(tmp_path))
+    assert manifest.has_file("ru_a.mp3")
+    assert manifest.entries["ru_a.mp3"]["mtime_ns"] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_new_and_vanished_files(tmp_path):
+    recorded(tmp_path)
+    os.remove(tmp_path / "ru_a.mp3")
+    write(tmp_path / "en_b.mp3", MP3)
+    write(tmp_path / "ru_c.mp3", b"not audio")
+    manifest = AudioManifest(str(tmp_path))
+    assert sorted(manifest.entries) == ["en_b.mp3"]
+    assert manifest.entries["en_b.mp3"]["language"] == "en"
+    assert (tmp_path / "ru_c.mp3").exists()
+
+
+def test_verify(tmp_path):
+    manifest = recorded(tmp_path)
+    assert manifest.verify() == []
+    write(tmp_path / "ru_a.mp3", OTHER)
+    assert manifest.verify(repair=False) == ["ru_a.mp3"]
+    assert manifest.has_file("ru_a.mp3")
+    assert manifest.verify() == ["ru_a.mp3"]
+    assert not manifest.has_file("ru_a.mp3")
+    assert not (tmp_path / "ru_a.mp3").exists()
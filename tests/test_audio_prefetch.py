@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from audio_downloader import audio_filename
+from audio_prefetch import AudioPrefetcher, neighbour_indices
+
+WORDS = [(f"слово {i}", f"word {i}") for i in range(20)]
+
+
+class GatedFetch:
+    """fetch() stand-in that blocks until released, recording what it was asked for"""
+
+    def __init__(self):
+        self.started = []
+        self.gate = threading.Event()
+        self.cond = threading.Condition()
+
+    def __call__(self, text, language, filename, proxy=None):
+        with self.cond:
+            self.started.append(text)
+            self.cond.notify_all()
+        self.gate.wait(5)
+        return filename, None
+
+    def wait_started(self, count):
+        with self.cond:
+            assert self.cond.wait_for(lambda: len(self.started) >= count, 5)
+
+
+@pytest.fixture
+def fetch():
+    fetch = GatedFetch()
+    yield fetch
+    fetch.gate.set()
+
+
+def test_neighbour_indices():
+    assert neighbour_indices(5, 20, 4) == [5, 6, 9, 4, 1, 7, 8]
+    assert neighbour_indices(0, 3, 4) == [0, 1, 2]
+
+
+def test_claim_of_a_queued_word_takes_it_over(tmp_path, fetch):
+    prefetcher = AudioPrefetcher(fetch, workers=1)
+    try:
+        prefetcher.update(WORDS, 0, 4, str(tmp_path))
+        fetch.wait_started(1)  # The only worker is busy with word 0; the rest wait in the queue
+        text = WORDS[4][0]
+        future, owned = prefetcher.claim(text, str(tmp_path))
+        assert owned
+        assert future.running()
+
+        filename = audio_filename(str(tmp_path), text, "ru")
+        prefetcher.release(future, filename, (filename, None))
+        assert future.result(1) == (filename, None)
+        fetch.gate.set()
+    finally:
+        prefetcher.shutdown()
+    assert text not in fetch.started
+
+
+def test_claim_of_an_inflight_word_waits_for_the_worker(tmp_path, fetch):
+    prefetcher = AudioPrefetcher(fetch, workers=1)
+    try:
+        prefetcher.update(WORDS, 0, 4, str(tmp_path))
+        fetch.wait_started(1)
+        future, owned = prefetcher.claim(WORDS[0][0], str(tmp_path))
+        assert not owned
+        assert not future.done()
+        fetch.gate.set()
+        filename = audio_filename(str(tmp_path), WORDS[0][0], "ru")
+        assert future.result(5) == (filename, None)
+    finally:
+        prefetcher.shutdown()
+
+
+def test_claim_of_an_unknown_word_is_owned_and_released(tmp_path, fetch):
+    prefetcher = AudioPrefetcher(fetch, workers=1)
+    try:
+        future, owned = prefetcher.claim("новое", str(tmp_path))
+        assert owned
+        again, owned_again = prefetcher.claim("новое", str(tmp_path))
+        assert again is future and not owned_again
+
+        filename = audio_filename(str(tmp_path), "новое", "ru")
+        prefetcher.release(future, filename, (None, "Status: 503"))
+        assert again.result(1) == (None, "Status: 503")
+        assert filename not in prefetcher.inflight
+        assert prefetcher.claim("новое", str(tmp_path))[1]
+    finally:
+        prefetcher.shutdown()
+
+
+def test_new_selection_cancels_stale_prefetches(tmp_path, fetch):
+    prefetcher = AudioPrefetcher(fetch, workers=1)
+    try:
+        prefetcher.update(WORDS, 0, 4, str(tmp_path))
+        fetch.wait_started(1)
+        stale = [job[0] for job in prefetcher.queue]
+        assert stale
+        prefetcher.update(WORDS, 15, 4, str(tmp_path))
+        assert all(future.cancelled() for future in stale)
+        assert {job[1] for job in prefetcher.queue} <= {text for text, _ in WORDS[10:]}
+    finally:
+        prefetcher.shutdown()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+import audio_manifest
+from audio_manifest import get_manifest, is_cached, linked_path
+from audio_store import (adopt_legacy, adopt_legacy_audio, legacy_audio, legacy_name, link_legacy_audio,
+                         normalize_text, store_name)
+from level_store import LevelStore
+from levels import audio_store_dir, level_audio_dir, level_excel_path
+from vocab_cache import cache_path, write_cache
+
+MP3 = b"\xff\xfb" + b"a" * 64
+WORDS = [("Привет", "Hello"), ("ёжик", "hedgehog")]
+
+
+@pytest.fixture(autouse=True)
+def no_links(monkeypatch):
+    monkeypatch.setattr(audio_manifest, "_linked", {})
+
+
+def write_legacy(words_dir, level, clips):
+    """Write {text: data} as ru_ clips into the level's legacy folder"""
+    folder = level_audio_dir(words_dir, level)
+    os.makedirs(folder, exist_ok=True)
+    for text, data in clips.items():
+        with open(os.path.join(folder, legacy_name(text, "ru")), "wb") as f:
+            f.write(data)
+    return folder
+
+
+def test_normalize_text():
+    assert normalize_text("  Ёжик   в\tтумане ") == "ёжик в тумане"
+    assert normalize_text("e\u0301") == normalize_text("\u00e9")
+
+
+def test_store_name_ignores_case_and_spacing():
+    name = store_name("Привет", "ru")
+    assert name.startswith("ru_") and name.endswith(".mp3")
+    assert store_name("привет ", "ru") == name
+    assert store_name("ПРИВЕТ", "RU").endswith(name[3:])
+    assert store_name("привет", "en") != name
+    assert store_name("пока", "ru") != name
+
+
+def test_link_leaves_legacy_files_in_place(tmp_path):
+    words_dir = str(tmp_path / "words")
+    folder = write_legacy(words_dir, "A1", {"Привет": MP3, "ёжик": b"", "чужое": MP3})
+
+    assert link_legacy_audio(words_dir, "A1", WORDS) == 1
+    assert sorted(os.listdir(folder)) == sorted(legacy_name(t, "ru") for t in ("Привет", "ёжик", "чужое"))
+    assert not os.path.exists(audio_store_dir(words_dir))
+
+    store = audio_store_dir(words_dir)
+    linked = os.path.join(folder, legacy_name("Привет", "ru"))
+    assert linked_path(store_name("привет", "ru")) == linked
+    assert is_cached(os.path.join(store, store_name("привет", "ru")))
+    assert not is_cached(os.path.join(store, store_name("ёжик", "ru")))
+
+
+def test_adopt_moves_clips_into_the_store(tmp_path):
+    words_dir = str(tmp_path / "words")
+    folder = write_legacy(words_dir, "A1", {"Привет": MP3, "ёжик": b"not audio"})
+    store = audio_store_dir(words_dir)
+    assert legacy_audio(words_dir, "A1", WORDS) == {store_name("привет", "ru")}
+
+    assert adopt_legacy_audio(words_dir, "A1", WORDS) == 1
+    assert not os.path.exists(folder)
+    name = store_name("привет", "ru")
+    with open(os.path.join(store, name), "rb") as f:
+        assert f.read() == MP3
+    entry = get_manifest(store).entries[name]
+    assert (entry["text"], entry["language"]) == ("Привет", "ru")
+
+
+def test_adopt_drops_copies_the_store_already_has(tmp_path):
+    words_dir = str(tmp_path / "words")
+    assert adopt_legacy_audio(words_dir, "A1", WORDS[:1]) == 0
+    write_legacy(words_dir, "A1", {"Привет": MP3})
+    adopt_legacy_audio(words_dir, "A1", WORDS)
+
+    folder = write_legacy(words_dir, "A2", {"привет": b"\xff\xfb other"})
+    assert adopt_legacy(audio_store_dir(words_dir), folder, [("привет", "hello")]) == 0
+    assert not os.path.exists(folder)
+    with open(os.path.join(audio_store_dir(words_dir), store_name("привет", "ru")), "rb") as f:
+        assert f.read() == MP3
+
+
+def test_linked_clips_are_still_migrated(tmp_path):
+    words_dir = str(tmp_path / "words")
+    folder = write_legacy(words_dir, "A1", {"Привет": MP3})
+    link_legacy_audio(words_dir, "A1", WORDS)
+    assert adopt_legacy_audio(words_dir, "A1", WORDS) == 1
+    assert not os.path.exists(folder)
+
+
+def test_level_store_creates_level_folder_and_links_audio(tmp_path):
+    words_dir = str(tmp_path / "words")
+    created = []
+
+    def create_excel(level, path):
+        with open(path, "wb") as f:
+            f.write(b"sheet")
+        write_cache(cache_path(path), os.stat(path), WORDS)
+        created.append(level)
+
+    store = LevelStore(words_dir, levels=["A1", "A2"], create_excel=create_excel)
+    try:
+        assert store.get("A2") == WORDS
+        assert created == ["A2"]
+        assert os.path.isfile(level_excel_path(words_dir, "A2"))
+        assert os.path.isdir(audio_store_dir(words_dir))
+
+        folder = write_legacy(words_dir, "A1", {"ёжик": MP3})
+        store.get("A1")
+        assert os.listdir(folder) == [legacy_name("ёжик", "ru")]
+        assert get_manifest(audio_store_dir(words_dir)).has_file(store_name("ёжик", "ru"))
+    finally:
+        store.shutdown()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from audio_stream import TAIL_PROBE, ProgressiveBuffer
+
+DATA = bytes(range(256)) * 16
+
+
+def read(buffer, size):
+    chunk = bytearray(size)
+    count = buffer.readinto(chunk)
+    return bytes(chunk[:count])
+
+
+def feed_later(buffer, chunks, delay=0.05, end=None):
+    def run():
+        for chunk in chunks:
+            time.sleep(delay)
+            buffer.feed(chunk)
+        if end is not None:
+            end()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        yield pool
+
+
+def test_readinto_waits_for_data(pool):
+    buffer = ProgressiveBuffer(total=len(DATA))
+    buffer.feed(DATA[:100])
+    assert read(buffer, 50) == DATA[:50]
+
+    pending = pool.submit(read, buffer, 200)
+    time.sleep(0.05)
+    assert not pending.done()  # Bytes 100-250 have not arrived yet
+    buffer.feed(DATA[100:1000])
+    assert pending.result(1) == DATA[50:250]
+    assert buffer.tell() == 250
+
+
+def test_reads_end_at_the_total():
+    buffer = ProgressiveBuffer(total=len(DATA))
+    feed_later(buffer, [DATA[:2000], DATA[2000:]], end=buffer.finish)
+    assert read(buffer, len(DATA) + 100) == DATA
+    assert read(buffer, 10) == b""
+
+
+def test_failed_download_ends_blocked_reads(pool):
+    buffer = ProgressiveBuffer()
+    buffer.feed(DATA[:10])
+    pending = pool.submit(read, buffer, 100)
+    time.sleep(0.05)
+    buffer.fail("Status: 503")
+    assert pending.result(1) == DATA[:10]
+    assert buffer.error == "Status: 503"
+
+
+def test_seek_to_the_end_waits_for_the_size(pool):
+    buffer = ProgressiveBuffer()
+    pending = pool.submit(buffer.seek, -10, io.SEEK_END)
+    time.sleep(0.05)
+    assert not pending.done()
+    buffer.total = len(DATA)
+    buffer.feed(b"")
+    assert pending.result(1) == len(DATA) - 10
+
+
+def test_seek_within_the_stream():
+    buffer = ProgressiveBuffer(total=len(DATA))
+    buffer.feed(DATA)
+    assert buffer.seek(100) == 100
+    assert buffer.seek(-50, io.SEEK_CUR) == 50
+    assert read(buffer, 4) == DATA[50:54]
+    assert buffer.seek(-10) == 0
+
+
+def test_tail_probe_does_not_block_while_loading():
+    buffer = ProgressiveBuffer(total=len(DATA))
+    buffer.feed(DATA[:100])
+    buffer.seek(-TAIL_PROBE // 2, io.SEEK_END)
+    assert read(buffer, TAIL_PROBE) == bytes(TAIL_PROBE // 2)
+
+    buffer.end_probing()
+    feed_later(buffer, [DATA[100:]])
+    buffer.seek(-4, io.SEEK_END)
+    assert read(buffer, 4) == DATA[-4:]
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import os
+
+from drill_scheduler import (AGAIN_DELAY, DAY, GRADE_AGAIN, GRADE_EASY, GRADE_GOOD, GRADE_HARD, LOG_MAGIC,
+                             LOG_RECORD, CardState, DrillScheduler, ReviewLog, card_id)
+
+START = 1_700_000_000.0
+LEVELS = {
+    "A1": [("да", "yes"), ("нет", "no"), ("привет", "hello")],
+    "A2": [("Да", "yes, sure"), ("думать", "to think"), ("знать", "to know")],
+}
+
+
+class Clock:
+    def __init__(self, now=START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(tmp_path, clock, new_per_day=20):
+    scheduler = DrillScheduler(str(tmp_path / "drill_reviews.log"), new_per_day=new_per_day, clock=clock)
+    scheduler.load()
+    for level, words in LEVELS.items():
+        scheduler.add_level(level, words)
+    return scheduler
+
+
+def test_card_review_intervals():
+    state = CardState()
+    state.review(GRADE_GOOD, START)
+    assert state.interval == 1.0 and state.reps == 1
+    state.review(GRADE_GOOD, START)
+    assert state.interval == 2.5
+    state.review(GRADE_EASY, START)
+    assert state.interval > 2.5 * 2.5
+    state.review(GRADE_AGAIN, START)
+    assert state.reps == 0 and state.lapses == 1
+    assert state.due == START + AGAIN_DELAY
+    for _ in range(20):
+        state.review(GRADE_HARD, START)
+    assert state.ease == 1.3
+
+
+def test_shared_words_are_one_card(tmp_path):
+    scheduler = make_scheduler(tmp_path, Clock())
+    assert card_id("да") == card_id("Да ")
+    assert len(scheduler.cards) == 5
+    assert scheduler.cards[card_id("да")] == ("A1", "да", "yes")
+
+
+def test_new_cards_in_level_order_up_to_the_daily_limit(tmp_path):
+    clock = Clock()
+    scheduler = make_scheduler(tmp_path, clock, new_per_day=3)
+    assert [card[2] for card in scheduler.upcoming(10)] == ["да", "нет", "привет"]
+    for _ in range(3):
+        scheduler.review(scheduler.next_card()[0], GRADE_GOOD)
+    assert scheduler.next_card() is None
+    assert scheduler.counts() == (0, 0)
+
+    clock.now += DAY
+    due = [card[2] for card in scheduler.upcoming(10)]
+    # Reviewed at the same moment, so due together; ties go by card id
+    assert sorted(due[:3]) == sorted(["да", "нет", "привет"])
+    assert due[3:] == ["думать", "знать"]
+
+
+def test_daily_limit_survives_a_restart(tmp_path):
+    clock = Clock()
+    scheduler = make_scheduler(tmp_path, clock, new_per_day=3)
+    for _ in range(3):
+        scheduler.review(scheduler.next_card()[0], GRADE_GOOD)
+
+    restarted = make_scheduler(tmp_path, clock, new_per_day=3)
+    assert restarted.next_card() is None
+    assert restarted.counts() == (0, 0)
+
+
+def test_again_comes_back_after_the_delay(tmp_path):
+    clock = Clock()
+    scheduler = make_scheduler(tmp_path, clock, new_per_day=1)
+    key = scheduler.next_card()[0]
+    scheduler.review(key, GRADE_AGAIN)
+    assert scheduler.next_card() is None
+    assert scheduler.next_due() == START + AGAIN_DELAY
+    clock.now += AGAIN_DELAY
+    assert scheduler.next_card()[0] == key
+    assert scheduler.counts() == (1, 0)
+
+
+def test_due_order_and_counts(tmp_path):
+    clock = Clock()
+    scheduler = make_scheduler(tmp_path, clock)
+    grades = {"да": GRADE_EASY, "нет": GRADE_HARD, "привет": GRADE_GOOD}
+    while True:
+        card = scheduler.next_card()
+        if card is None or card[2] not in grades:
+            break
+        scheduler.review(card[0], grades[card[2]])
+    clock.now += 10 * DAY
+    due = [card[2] for card in scheduler.upcoming(3)]
+    assert due == ["нет", "привет", "да"]
+    assert scheduler.counts()[0] == 3
+    # Peeking does not consume cards
+    assert [card[2] for card in scheduler.upcoming(3)] == due
+
+
+def test_log_round_trip_and_incremental_load(tmp_path):
+    clock = Clock()
+    scheduler = make_scheduler(tmp_path, clock)
+    for _ in range(4):
+        scheduler.review(scheduler.next_card()[0], GRADE_GOOD)
+    path = str(tmp_path / "drill_reviews.log")
+    assert os.path.getsize(path) == len(LOG_MAGIC) + 4 * LOG_RECORD.size
+
+    reader = ReviewLog(path)
+    states = {}
+    assert reader.load_new(states) == 4
+    for key, state in states.items():
+        original = scheduler.states[key]
+        assert (state.due, state.reps, state.lapses, state.introduced) == \
+            (original.due, original.reps, original.lapses, original.introduced)
+        assert abs(state.ease - original.ease) < 1e-3
+    assert reader.load_new(states) == 0
+
+    scheduler.review(scheduler.next_card()[0], GRADE_HARD)
+    assert reader.load_new(states) == 1
+
+    # A torn record at the end is skipped until it is complete
+    with open(path, "ab") as f:
+        f.write(b"\x00" * (LOG_RECORD.size - 1))
+    assert reader.load_new(states) == 0
+
+
+def test_compact_keeps_the_latest_state(tmp_path):
+    path = str(tmp_path / "drill_reviews.log")
+    log = ReviewLog(path)
+    state = CardState()
+    for day in range(5):
+        state.review(GRADE_GOOD, START + day * DAY)
+        log.append(1, state)
+    log.compact({1: state})
+    assert os.path.getsize(path) == len(LOG_MAGIC) + LOG_RECORD.size
+    states = {}
+    ReviewLog(path).load_new(states)
+    assert states[1].reps == 5
+
+
+def test_unknown_log_is_set_aside(tmp_path):
+    path = tmp_path / "drill_reviews.log"
+    path.write_bytes(b"junk" * 10)
+    scheduler = make_scheduler(tmp_path, Clock())
+    assert not path.exists()
+    scheduler.review(scheduler.next_card()[0], GRADE_GOOD)
+    assert path.read_bytes()[:len(LOG_MAGIC)] == LOG_MAGIC
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from vocab_cache import CACHE_HEADER, cache_path, load_words, read_cache, write_cache
+
+WORDS = [("привет", "Hello"), ("ёжик", "hedgehog"), ("да", "Yes, sure")]
+
+
+def test_round_trip(tmp_path):
+    source = tmp_path / "word_A1.xlsx"
+    source.write_bytes(b"sheet")
+    stat = os.stat(source)
+    path = str(tmp_path / "word_A1.vocab")
+    write_cache(path, stat, WORDS)
+    assert read_cache(path, stat) == WORDS
+
+
+def test_empty_level(tmp_path):
+    source = tmp_path / "word_A1.xlsx"
+    source.write_bytes(b"sheet")
+    stat = os.stat(source)
+    path = str(tmp_path / "word_A1.vocab")
+    write_cache(path, stat, [])
+    assert read_cache(path, stat) == []
+
+
+def test_stale_or_damaged_cache_is_ignored(tmp_path):
+    source = tmp_path / "word_A1.xlsx"
+    source.write_bytes(b"sheet")
+    stat = os.stat(source)
+    path = str(tmp_path / "word_A1.vocab")
+    write_cache(path, stat, WORDS)
+
+    source.write_bytes(b"edited sheet")
+    assert read_cache(path, os.stat(source)) is None
+
+    data = open(path, "rb").read()
+    with open(path, "wb") as f:
+        f.write(data[:-3])
+    assert read_cache(path, stat) is None
+    assert read_cache(str(tmp_path / "missing.vocab"), stat) is None
+    with open(path, "wb") as f:
+        f.write(data[:CACHE_HEADER.size - 1])
+    assert read_cache(path, stat) is None
+
+
+def test_load_words_builds_the_cache(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    excel_path = str(tmp_path / "word_A1.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Russian", "English"])
+    for russian, english in WORDS:
+        ws.append([russian, english])
+    ws.append(["без перевода", None])
+    wb.save(excel_path)
+
+    assert load_words(excel_path) == WORDS
+    assert os.path.exists(cache_path(excel_path))
+    assert read_cache(cache_path(excel_path), os.stat(excel_path)) == WORDS
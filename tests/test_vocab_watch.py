@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import random
+
+from vocab_watch import SpreadsheetWatcher, changed_ranges, diff_words, remap_index, summarize
+
+WORDS = [(f"слово{i}", f"word{i}") for i in range(20)]
+
+
+def apply_opcodes(old, new, opcodes):
+    """Rebuild new from old and the non-equal opcodes"""
+    result = []
+    pos = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        result.extend(old[pos:i1])
+        result.extend(new[j1:j2])
+        pos = i2
+    result.extend(old[pos:])
+    return result
+
+
+def test_no_changes():
+    assert diff_words(WORDS, list(WORDS)) == []
+
+
+def test_diff_random_edits():
+    rng = random.Random(3)
+    for _ in range(200):
+        old = [(f"w{rng.randrange(30)}", "e") for _ in range(rng.randrange(40))]
+        new = list(old)
+        for _ in range(rng.randrange(4)):
+            op = rng.choice("irc")
+            if op == "i" or not new:
+                new.insert(rng.randrange(len(new) + 1), (f"new{rng.random()}", "e"))
+            elif op == "r":
+                del new[rng.randrange(len(new))]
+            else:
+                new[rng.randrange(len(new))] = (f"chg{rng.random()}", "e")
+        opcodes = diff_words(old, new)
+        assert apply_opcodes(old, new, opcodes) == new
+        assert all(tag != "equal" for tag, *_ in opcodes)
+
+
+def test_changed_row_keeps_positions():
+    new = list(WORDS)
+    new[5] = ("изменено", "changed")
+    opcodes = diff_words(WORDS, new)
+    assert opcodes == [("replace", 5, 6, 5, 6)]
+    assert changed_ranges(opcodes) == [(5, 6)]
+    assert summarize(opcodes) == (0, 0, 1)
+    assert remap_index(opcodes, 10) == 10
+
+
+def test_insert_shifts_the_rest():
+    new = list(WORDS)
+    new[3:3] = [("новое", "new"), ("ещё", "more")]
+    opcodes = diff_words(WORDS, new)
+    assert changed_ranges(opcodes) == [(3, None)]
+    assert summarize(opcodes) == (2, 0, 0)
+    assert remap_index(opcodes, 2) == 2
+    assert remap_index(opcodes, 10) == 12
+    assert new[remap_index(opcodes, 10)] == WORDS[10]
+
+
+def test_remap_follows_the_selected_word():
+    rng = random.Random(5)
+    for _ in range(200):
+        old = [(f"w{i}", "e") for i in range(30)]
+        new = list(old)
+        for _ in range(rng.randrange(1, 4)):
+            if rng.random() < 0.5:
+                new.insert(rng.randrange(len(new) + 1), (f"new{rng.random()}", "e"))
+            else:
+                del new[rng.randrange(len(new))]
+        opcodes = diff_words(old, new)
+        index = rng.randrange(len(old))
+        remapped = remap_index(opcodes, index)
+        if old[index] in new:
+            assert new[remapped] == old[index]
+        else:
+            assert 0 <= remapped <= len(new)
+
+
+def test_delete_and_summary():
+    new = WORDS[:4] + WORDS[7:]
+    opcodes = diff_words(WORDS, new)
+    assert summarize(opcodes) == (0, 3, 0)
+    # A deleted row maps to where it used to be
+    assert remap_index(opcodes, 5) == 4
+    assert remap_index(opcodes, 8) == 5
+
+
+class FakeRoot:
+    """Just enough of Tk's after() to drive the watcher by hand"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def after(self, ms, func):
+        self.jobs.append(func)
+        return len(self.jobs)
+
+    def after_cancel(self, job):
+        pass
+
+
+def test_watcher_reports_settled_changes(tmp_path):
+    path = tmp_path / "word_A1.xlsx"
+    path.write_bytes(b"v1")
+    changes = []
+    root = FakeRoot()
+    watcher = SpreadsheetWatcher(root, lambda: str(path), changes.append)
+    watcher.start()
+
+    watcher.poll()
+    assert changes == []
+    path.write_bytes(b"version 2")
+    watcher.poll()  # Seen once: may still be being written
+    assert changes == []
+    watcher.poll()
+    assert changes == [str(path)]
+    watcher.poll()
+    assert changes == [str(path)]
+
+    path.write_bytes(b"version three")
+    watcher.rebase()  # Loaded by other means
+    watcher.poll()
+    watcher.poll()
+    assert changes == [str(path)]
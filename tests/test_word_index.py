@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import random
+
+from word_index import (RANK_EXACT, RANK_PREFIX, RANK_SUBSTRING, RANK_WORD_PREFIX, LevelIndex, WordIndex,
+                        fold, match_rank)
+
+A1 = [("привет", "Hello"), ("ёлка", "fir tree"), ("да", "Yes"), ("дай", "give"), ("иди сюда", "come here")]
+A2 = [("говорить", "to speak"), ("зда́ние", "building"), ("Да", "yes, indeed")]
+
+
+def test_fold():
+    assert fold("Ёлка") == "елка"
+    assert fold("зда́ние") == "здание"
+    assert fold("  Hello   World ") == "hello world"
+    # The breve is kept: й and и are different letters
+    assert fold("дай") != fold("даи")
+
+
+def test_match_rank():
+    assert match_rank("да", "да") == RANK_EXACT
+    assert match_rank("дай", "да") == RANK_PREFIX
+    assert match_rank("иди сюда", "сю") == RANK_WORD_PREFIX
+    assert match_rank("иди сюда", "да") == RANK_SUBSTRING
+    assert match_rank("привет", "пока") is None
+
+
+def brute_force(words, query):
+    hits = []
+    for i, (russian, english) in enumerate(words):
+        ranks = [r for r in (match_rank(fold(russian), query), match_rank(fold(english), query)) if r is not None]
+        if ranks:
+            hits.append((min(ranks), i))
+    return sorted(hits)
+
+
+def test_level_index_matches_brute_force():
+    rng = random.Random(7)
+    alphabet = "абвгдеёжзийклмнопрст "
+    words = [("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10))).strip() or "а",
+              "".join(rng.choice("abcde ") for _ in range(rng.randint(1, 8))).strip() or "a")
+             for _ in range(300)]
+    index = LevelIndex(words)
+    for _ in range(300):
+        russian, english = rng.choice(words)
+        source = fold(rng.choice([russian, english]))
+        start = rng.randrange(len(source))
+        query = source[start:start + rng.randint(1, 4)].strip()
+        if query:
+            assert index.search(query) == brute_force(words, query), query
+
+
+def test_search_ranks_across_levels():
+    index = WordIndex(["A1", "A2"])
+    index.add_level("A1", A1)
+    index.add_level("A2", A2)
+    hits = index.search("да")
+    # Exact matches first, in level order, then prefixes, then substrings
+    assert hits[:2] == [("A1", 2), ("A2", 2)]
+    assert hits[2] == ("A1", 3)
+    assert set(hits) == {("A1", 2), ("A2", 2), ("A1", 3), ("A1", 4), ("A2", 1)}
+    assert index.word("A2", 1) == A2[1]
+
+
+def test_search_filters_and_limits():
+    index = WordIndex(["A1", "A2"])
+    index.add_level("A1", A1)
+    index.add_level("A2", A2)
+    assert index.search("да", levels=["A2"]) == [("A2", 2), ("A2", 1)]
+    assert index.search("да", limit=1) == [("A1", 2)]
+    assert index.search("   ") == []
+    assert index.search("ЁЛК") == [("A1", 1)]
+
+
+def test_narrowing_query_reuses_hits_but_stays_correct():
+    index = WordIndex(["A1"])
+    index.add_level("A1", A1)
+    assert ("A1", 0) in index.search("при")
+    assert index.search("прив") == [("A1", 0)]
+    # A new level invalidates the previous hits
+    index.add_level("A1", [("привал", "halt")])
+    assert index.search("прива") == [("A1", 0)]
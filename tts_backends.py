@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Text-to-speech providers behind a small registry
+
+A backend turns (text, language) into mp3 bytes.  The download pipeline
+picks one per language, so the Google endpoint can be swapped for another
+provider, a local HTTP stand-in or the offline synthesizer.
+"""
+import hashlib
+import threading
+import time
+from urllib.parse import quote, urlparse, parse_qs
+
+from instrumentation import metrics
+
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TTSError(Exception):
+    """A failed synthesis; status is the HTTP status or None for network errors"""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.status is None or self.status in RETRY_STATUS
+
+
+class TTSBackend:
+    """Base class for providers; subclasses implement synthesize"""
+
+    name = None
+
+    def rate_key(self):
+        """Key used for per-host rate limiting, or None for no limit"""
+        return None
+
+    def synthesize(self, session, text, language, timeout=30, proxies=None):
+        """Return mp3 bytes for text or raise TTSError"""
+        raise NotImplementedError
+
+    def open_stream(self, session, text, language, timeout=30, proxies=None):
+        """Return (total size or None, iterator of mp3 chunks) or raise TTSError"""
+        data = self.synthesize(session, text, language, timeout=timeout, proxies=proxies)
+        return len(data), iter([data])
+
+
+class HTTPTTS(TTSBackend):
+    """Any GET endpoint taking {language} and {text} placeholders in its URL"""
+
+    name = "http"
+
+    def __init__(self, url_template, headers=None):
+        self.url_template = url_template
+        self.headers = headers or {}
+
+    def rate_key(self):
+        return urlparse(self.url_template).netloc
+
+    def build_url(self, text, language):
+        return self.url_template.format(language=language, text=quote(text))
+
+    def synthesize(self, session, text, language, timeout=30, proxies=None):
+        import requests
+
+        url = self.build_url(text, language)
+        try:
+            # requests resolves and connects inside the pool, so DNS, connect
+            # and time to first byte are one span; the body is timed separately
+            with metrics.span("tts.connect", backend=self.name):
+                response = session.get(url, headers=self.headers, timeout=timeout,
+                                       proxies=proxies, stream=True)
+            if response.status_code != 200:
+                response.close()
+                retry_after = response.headers.get("Retry-After")
+                raise TTSError(f"Status: {response.status_code}", response.status_code,
+                               float(retry_after) if retry_after and retry_after.isdigit() else None)
+            with metrics.span("tts.transfer", backend=self.name):
+                return response.content
+        except requests.RequestException as e:
+            raise TTSError(str(e))
+
+    def open_stream(self, session, text, language, timeout=30, proxies=None, chunk_size=4096):
+        import requests
+
+        url = self.build_url(text, language)
+        try:
+            with metrics.span("tts.connect", backend=self.name):
+                response = session.get(url, headers=self.headers, timeout=timeout,
+                                       proxies=proxies, stream=True)
+        except requests.RequestException as e:
+            raise TTSError(str(e))
+        if response.status_code != 200:
+            response.close()
+            raise TTSError(f"Status: {response.status_code}", response.status_code)
+
+        # Content-Length is the wire size; it only matches the body if uncompressed
+        length = response.headers.get("Content-Length")
+        total = int(length) if length and length.isdigit() and not response.headers.get("Content-Encoding") else None
+
+        def chunks():
+            try:
+                for chunk in response.iter_content(chunk_size):
+                    yield chunk
+            except requests.RequestException as e:
+                raise TTSError(str(e))
+            finally:
+                response.close()
+        return total, chunks()
+
+
+class GoogleTranslateTTS(HTTPTTS):
+    """The translate.google.com endpoint the app has always used"""
+
+    name = "google"
+
+    URL = "https://translate.google.com/translate_tts?ie=UTF-8&tl={language}&client=tw-ob&q={text}"
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Referer': 'https://translate.google.com/'
+    }
+
+    def __init__(self):
+        super().__init__(self.URL, self.HEADERS)
+
+
+# One MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono.  With all-zero side
+# information it decodes as 26 ms of silence.
+SILENT_FRAME = b"\xff\xfb\x90\xc4" + b"\x00" * 413
+FRAME_SECONDS = 1152 / 44100
+
+
+def id3_tag(title):
+    """Minimal ID3v2.4 tag holding a utf-8 title frame"""
+    def syncsafe(n):
+        return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+    body = b"\x03" + title.encode("utf-8")
+    frame = b"TIT2" + syncsafe(len(body)) + b"\x00\x00" + body
+    return b"ID3\x04\x00\x00" + syncsafe(len(frame)) + frame
+
+
+def synthesize_offline(text, language, seconds_per_char=0.06, min_seconds=0.3):
+    """Deterministic mp3 for text: an ID3 title plus silence scaled to its length"""
+    seconds = max(min_seconds, len(text) * seconds_per_char)
+    frames = int(seconds / FRAME_SECONDS) + 1
+    return id3_tag(f"{language}:{text}") + SILENT_FRAME * frames
+
+
+class OfflineTTS(TTSBackend):
+    """Local stand-in that needs no network; output depends only on the input"""
+
+    name = "offline"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def synthesize(self, session, text, language, timeout=30, proxies=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return synthesize_offline(text, language)
+
+
+class LocalTTSServer:
+    """Fake TTS HTTP server serving offline audio, for load tests and benchmarks
+
+    Use url_template with HTTPTTS.  latency delays every response, and
+    error_rate makes roughly that fraction of requests answer 503, so
+    retries can be exercised.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0):
+        import http.server
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                text = query.get("q", [""])[0]
+                language = query.get("tl", ["ru"])[0]
+                with server.lock:
+                    server.requests += 1
+                    count = server.requests
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.error_rate and hashlib.sha1(str(count).encode()).digest()[0] < server.error_rate * 256:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = synthesize_offline(text, language)
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url_template(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/translate_tts?tl={{language}}&q={{text}}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="local-tts", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+_registry = {}
+
+
+def register_backend(name, factory):
+    """Make factory(**options) available under name"""
+    _registry[name] = factory
+
+
+def get_backend(name, **options):
+    try:
+        factory = _registry[name]
+    except KeyError:
+        raise ValueError(f"Unknown TTS backend: {name} (available: {', '.join(available_backends())})")
+    return factory(**options)
+
+
+def available_backends():
+    return sorted(_registry)
+
+
+register_backend(GoogleTranslateTTS.name, GoogleTranslateTTS)
+register_backend(HTTPTTS.name, HTTPTTS)
+register_backend(OfflineTTS.name, OfflineTTS)
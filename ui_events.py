@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Cross-thread event channel drained by the Tk loop at a fixed frame rate"""
+import queue
+
+
+class UIEventChannel:
+    """Let worker threads hand work to Tk without touching any widget themselves
+
+    Calls are queued and run in order on the Tk thread.  Status messages are
+    coalesced: only the latest one posted during a frame is shown, so a bulk
+    download updates the status bar at most once per frame instead of once
+    per file.
+    """
+
+    def __init__(self, root, set_status, interval_ms=50):
+        self.root = root
+        self.set_status = set_status
+        self.interval_ms = interval_ms
+        self.events = queue.SimpleQueue()
+        self.job = None
+
+    def start(self):
+        if self.job is None:
+            self.job = self.root.after(self.interval_ms, self.drain)
+
+    def stop(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def call(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the Tk thread; safe from any thread"""
+        self.events.put((func, args, kwargs))
+
+    def status(self, message):
+        """Show message in the status bar; safe from any thread"""
+        self.events.put((None, message, None))
+
+    def drain(self):
+        """Run everything queued since the last frame, then reschedule"""
+        latest_status = None
+        # Only what was queued before this frame, so a flood cannot starve Tk
+        for _ in range(self.events.qsize()):
+            func, args, kwargs = self.events.get_nowait()
+            if func is None:
+                latest_status = args
+                continue
+            # Keep ordering between status messages and calls
+            if latest_status is not None:
+                self.set_status(latest_status)
+                latest_status = None
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                print(f"UI event error: {e}")
+        if latest_status is not None:
+            self.set_status(latest_status)
+        self.job = self.root.after(self.interval_ms, self.drain)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Compiled per-level vocabulary cache so levels load without parsing xlsx"""
+import os
+import struct
+
+CACHE_MAGIC = b"RVC1"
+# magic, xlsx mtime (ns), xlsx size, word count, payload length
+CACHE_HEADER = struct.Struct("<4sqqII")
+SEPARATOR = "\x00"
+
+
+def cache_path(excel_path):
+    """Cache file stored next to the spreadsheet"""
+    return os.path.splitext(excel_path)[0] + ".vocab"
+
+
+def iter_excel_words(excel_path):
+    """Stream (russian, english) pairs from the first two columns of the sheet
+
+    The workbook is opened read-only, so rows are parsed one at a time from
+    the xlsx stream and memory does not grow with the sheet's other columns
+    or formatting.
+    """
+    import openpyxl  # Deferred: only needed when the cache is stale
+    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        for russian, english in wb.active.iter_rows(min_row=2, max_col=2, values_only=True):
+            if russian and english:
+                yield str(russian), str(english)
+    finally:
+        wb.close()
+
+
+def read_excel_words(excel_path):
+    """Parse (russian, english) pairs from the first two columns of the sheet"""
+    return list(iter_excel_words(excel_path))
+
+
+def write_cache(path, stat, words):
+    """Write words as one NUL separated utf-8 payload behind a fixed header"""
+    payload = SEPARATOR.join(part for pair in words for part in pair).encode("utf-8")
+    header = CACHE_HEADER.pack(CACHE_MAGIC, stat.st_mtime_ns, stat.st_size, len(words), len(payload))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_cache(path, stat):
+    """Return cached words, or None if the cache is missing or stale"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < CACHE_HEADER.size:
+        return None
+
+    magic, mtime_ns, size, count, length = CACHE_HEADER.unpack_from(data)
+    if (magic != CACHE_MAGIC or mtime_ns != stat.st_mtime_ns or size != stat.st_size
+            or len(data) != CACHE_HEADER.size + length):
+        return None
+    if count == 0:
+        return []
+
+    parts = data[CACHE_HEADER.size:].decode("utf-8").split(SEPARATOR)
+    if len(parts) != count * 2:
+        return None
+    return list(zip(parts[0::2], parts[1::2]))
+
+
+def load_words(excel_path):
+    """Load a level's words, rebuilding the cache only when the xlsx changed"""
+    stat = os.stat(excel_path)
+    path = cache_path(excel_path)
+    words = read_cache(path, stat)
+    if words is not None:
+        return words
+
+    words = read_excel_words(excel_path)
+    try:
+        write_cache(path, stat, words)
+    except OSError as e:
+        print(f"Cannot write vocabulary cache {path}: {e}")
+    return words
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Watch a level spreadsheet and turn edits into row-level changes"""
+import difflib
+import os
+
+
+def diff_words(old, new):
+    """Opcodes (tag, i1, i2, j1, j2) turning old into new, without the equal runs
+
+    The common head and tail are skipped in linear time so that a few edited
+    rows in a huge sheet only pay for difflib on the edited middle.
+    """
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old[len(old) - 1 - end] == new[len(new) - 1 - end]:
+        end += 1
+
+    old_mid = old[start:len(old) - end]
+    new_mid = new[start:len(new) - end]
+    if not old_mid and not new_mid:
+        return []
+    matcher = difflib.SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+    return [(tag, i1 + start, i2 + start, j1 + start, j2 + start)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+def remap_index(opcodes, index):
+    """Position in the new list of the row that was at index in the old one"""
+    shift = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        if index < i1:
+            break
+        if index < i2:
+            # The row itself was edited or removed: stay at the same spot
+            if tag == "replace":
+                return j1 + min(index - i1, j2 - j1 - 1)
+            return j1
+        shift = j2 - i2
+    return index + shift
+
+
+def changed_ranges(opcodes):
+    """New-list index ranges whose rows differ; end None means through the end"""
+    ranges = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if i2 - i1 == j2 - j1:
+            ranges.append((j1, j2))
+        else:
+            # Everything after an insert or delete moved
+            ranges.append((j1, None))
+            break
+    return ranges
+
+
+def summarize(opcodes):
+    """(added, removed, changed) row counts"""
+    added = removed = changed = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "replace":
+            common = min(i2 - i1, j2 - j1)
+            changed += common
+            added += j2 - j1 - common
+            removed += i2 - i1 - common
+        elif tag == "insert":
+            added += j2 - j1
+        else:
+            removed += i2 - i1
+    return added, removed, changed
+
+
+class SpreadsheetWatcher:
+    """Poll a file's stat on the Tk loop and report settled changes
+
+    A change is reported once the size and mtime have stayed the same for
+    one more poll, so a sheet still being written is not read half-way.
+    get_path is asked for the file on every poll, so the watcher follows
+    level switches; call rebase() after loading a file by other means.
+    """
+
+    def __init__(self, root, get_path, on_change, interval_ms=1000):
+        self.root = root
+        self.get_path = get_path
+        self.on_change = on_change
+        self.interval_ms = interval_ms
+        self.path = None
+        self.seen = None  # Stat key the current words were loaded from
+        self.pending = None  # New stat key waiting to settle
+        self.job = None
+
+    @staticmethod
+    def stat_key(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        if self.job is None:
+            self.rebase()
+            self.job = self.root.after(self.interval_ms, self.poll)
+
+    def stop(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def rebase(self):
+        """Treat the file as it is now as already loaded"""
+        self.path = self.get_path()
+        self.seen = self.stat_key(self.path)
+        self.pending = None
+
+    def poll(self):
+        path = self.get_path()
+        if path != self.path:
+            self.rebase()
+        else:
+            key = self.stat_key(path)
+            if key is None or key == self.seen:
+                self.pending = None
+            elif key != self.pending:
+                self.pending = key
+            else:
+                self.seen = key
+                self.pending = None
+                self.on_change(path)
+        self.job = self.root.after(self.interval_ms, self.poll)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Virtualized word grid that only materializes the rows visible in a canvas"""
+from tkinter import ttk
+
+
+class VirtualWordGrid:
+    """Lay out words on a canvas, recycling a small pool of buttons while scrolling"""
+
+    def __init__(self, canvas, on_select, scrollbar=None, row_height=32,
+                 min_column_width=120, overscan=2, padx=5, pady=2):
+        self.canvas = canvas
+        self.on_select = on_select
+        self.scrollbar = scrollbar
+        self.row_height = row_height
+        self.min_column_width = min_column_width
+        self.overscan = overscan
+        self.padx = padx
+        self.pady = pady
+
+        self.words = []
+        self.columns = 1
+        self.selection = -1
+
+        # Recycled widgets: each slot is [button, canvas item, shown index]
+        self.slots = []
+        self._pool_size = 0
+        self._cell_width = None
+        self._render_pending = False
+
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.bind("<Configure>", lambda e: self.render(), add="+")
+
+    @property
+    def total_rows(self):
+        return (len(self.words) + self.columns - 1) // self.columns
+
+    def column_width(self):
+        """Width of one grid cell for the current canvas size"""
+        width = max(self.canvas.winfo_width(), int(self.canvas.cget("width")))
+        return max(self.min_column_width, width // self.columns)
+
+    def viewport_height(self):
+        return max(self.canvas.winfo_height(), int(self.canvas.cget("height")))
+
+    def set_words(self, words):
+        """Show a new word list; cost is independent of its length"""
+        self.words = words
+        self.selection = min(self.selection, len(words) - 1)
+        self.invalidate()
+        self.update_scrollregion()
+        self.canvas.yview_moveto(0)
+        self.render()
+
+    def update_words(self, words, ranges):
+        """Swap in an edited word list, re-rendering only the given (start, end) index ranges
+
+        end may be None for "through the end".  Scroll position is kept.
+        """
+        self.words = words
+        self.selection = min(self.selection, len(words) - 1)
+        for slot in self.slots:
+            shown = slot[2]
+            if shown is not None and any(start <= shown and (end is None or shown < end)
+                                         for start, end in ranges):
+                self.canvas.itemconfigure(slot[1], state="hidden")
+                slot[2] = None
+        self.update_scrollregion()
+        self.render()
+
+    def set_columns(self, columns):
+        """Change the column count and re-place the visible widgets"""
+        columns = max(1, columns)
+        if columns == self.columns:
+            return
+        self.columns = columns
+        self.invalidate()
+        self.update_scrollregion()
+        self.render()
+
+    def set_selection(self, index):
+        """Highlight index, restyling only the affected buttons"""
+        old, self.selection = self.selection, index
+        for button, item, shown in self.slots:
+            if shown in (old, index):
+                button.config(style=self.style_for(shown))
+
+    def invalidate(self):
+        """Hide every pooled widget so the next render re-places them"""
+        for slot in self.slots:
+            if slot[2] is not None:
+                self.canvas.itemconfigure(slot[1], state="hidden")
+                slot[2] = None
+
+    def style_for(self, index):
+        return "Selected.TButton" if index == self.selection else "TButton"
+
+    def update_scrollregion(self):
+        width = self.column_width() * self.columns
+        height = self.total_rows * self.row_height
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+    def see(self, index):
+        """Scroll the minimum amount needed to make index visible"""
+        if not (0 <= index < len(self.words)) or not self.total_rows:
+            return
+        total_height = self.total_rows * self.row_height
+        top = (index // self.columns) * self.row_height
+        bottom = top + self.row_height
+        visible_top = self.canvas.yview()[0] * total_height
+        visible_bottom = visible_top + self.viewport_height()
+
+        if top < visible_top:
+            self.canvas.yview_moveto(top / total_height)
+        elif bottom > visible_bottom:
+            self.canvas.yview_moveto((bottom - self.viewport_height()) / total_height)
+
+    def _on_yscroll(self, first, last):
+        """Called by the canvas whenever its view moves"""
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if not self._render_pending:
+            self._render_pending = True
+            self.canvas.after_idle(self.render)
+
+    def visible_range(self):
+        """Indices of the words that should currently have widgets"""
+        total_height = self.total_rows * self.row_height
+        top = self.canvas.yview()[0] * total_height
+        first_row = max(0, int(top // self.row_height) - self.overscan)
+        visible_rows = self.viewport_height() // self.row_height + 1
+        last_row = min(self.total_rows, first_row + visible_rows + 2 * self.overscan)
+        return first_row * self.columns, min(len(self.words), last_row * self.columns)
+
+    def pool_size(self):
+        visible_rows = self.viewport_height() // self.row_height + 1
+        return (visible_rows + 2 * self.overscan) * self.columns
+
+    def ensure_pool(self, size):
+        """Grow the widget pool; slots are never destroyed, only hidden"""
+        if size != self._pool_size:
+            self.invalidate()
+            self._pool_size = size
+        while len(self.slots) < size:
+            slot = [None, None, None]
+            button = ttk.Button(self.canvas, command=lambda s=slot: self._on_click(s))
+            item = self.canvas.create_window(0, 0, window=button, anchor="nw", state="hidden")
+            slot[0], slot[1] = button, item
+            self.slots.append(slot)
+        return self.slots[:size]
+
+    def _on_click(self, slot):
+        if slot[2] is not None:
+            self.on_select(slot[2])
+
+    def render(self):
+        """Materialize the visible rows, reusing widgets by index modulo pool size"""
+        self._render_pending = False
+        size = self.pool_size()
+        slots = self.ensure_pool(size)
+        start, end = self.visible_range()
+        cell_width = self.column_width()
+        if cell_width != self._cell_width:
+            self.invalidate()
+            self._cell_width = cell_width
+            self.update_scrollregion()
+
+        wanted = set()
+        for index in range(start, end):
+            slot = slots[index % size]
+            wanted.add(index % size)
+            if slot[2] == index:
+                continue
+            button, item = slot[0], slot[1]
+            button.config(text=self.words[index][0], style=self.style_for(index))
+            row, col = divmod(index, self.columns)
+            self.canvas.coords(item, col * cell_width + self.padx, row * self.row_height + self.pady)
+            self.canvas.itemconfigure(item, width=cell_width - 2 * self.padx,
+                                      height=self.row_height - 2 * self.pady, state="normal")
+            slot[2] = index
+
+        for i, slot in enumerate(self.slots):
+            if i not in wanted and slot[2] is not None:
+                self.canvas.itemconfigure(slot[1], state="hidden")
+                slot[2] = None
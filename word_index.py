@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Search index over the Russian and English columns of any number of levels
+
+Both columns are folded (case, ё/е, accents and stress marks) once, when a
+level is added.  Every one- and two-character substring of a field gets a
+posting list of (rank, word index), so the first keystrokes of a query are
+answered from a dict without scanning; longer queries only re-check the
+words of the query's rarest character pair, or the previous query's hits
+while the user keeps typing.  Hits are ranked: whole field, field prefix,
+word prefix, then any substring.
+"""
+import heapq
+import threading
+import unicodedata
+
+KEEP_MARKS = {"\u0306"}  # Breve: й must not fold to и
+GRAM_SIZE = 2
+
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_WORD_PREFIX = 2
+RANK_SUBSTRING = 3
+
+
+def fold(text):
+    """Search form of text: case-folded, ё -> е, accents and stress marks removed"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c) or c in KEEP_MARKS)
+    return " ".join(unicodedata.normalize("NFC", stripped).split())
+
+
+def match_rank(field, query):
+    """Rank of query inside a folded field, or None"""
+    pos = field.find(query)
+    if pos < 0:
+        return None
+    if pos == 0:
+        return RANK_EXACT if len(field) == len(query) else RANK_PREFIX
+    while pos >= 0:
+        if not field[pos - 1].isalnum():
+            return RANK_WORD_PREFIX
+        pos = field.find(query, pos + 1)
+    return RANK_SUBSTRING
+
+
+class LevelIndex:
+    """Folded fields and short-substring postings of one level's words"""
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.fields = [(fold(russian), fold(english)) for russian, english in words]
+        self.grams = {}  # substring of up to GRAM_SIZE chars -> sorted [(rank, index)]
+        for index, pair in enumerate(self.fields):
+            best = {}
+            for field in pair:
+                for start in range(len(field)):
+                    if start == 0:
+                        rank = None
+                    elif field[start - 1].isalnum():
+                        rank = RANK_SUBSTRING
+                    else:
+                        rank = RANK_WORD_PREFIX
+                    for size in range(1, GRAM_SIZE + 1):
+                        gram = field[start:start + size]
+                        if len(gram) < size:
+                            break
+                        gram_rank = rank
+                        if gram_rank is None:
+                            gram_rank = RANK_EXACT if len(field) == size else RANK_PREFIX
+                        if gram_rank < best.get(gram, RANK_SUBSTRING + 1):
+                            best[gram] = gram_rank
+            for gram, rank in best.items():
+                self.grams.setdefault(gram, []).append((rank, index))
+        for postings in self.grams.values():
+            postings.sort()
+
+    def rank(self, index, query):
+        russian, english = self.fields[index]
+        ranks = [rank for rank in (match_rank(russian, query), match_rank(english, query)) if rank is not None]
+        return min(ranks) if ranks else None
+
+    def search(self, query, candidates=None):
+        """Sorted [(rank, index)] of words matching a folded query"""
+        if len(query) <= GRAM_SIZE:
+            return self.grams.get(query, [])
+        pairs = [self.grams.get(query[i:i + GRAM_SIZE], ()) for i in range(len(query) - GRAM_SIZE + 1)]
+        rarest = min(pairs, key=len)
+        if candidates is None or len(rarest) < len(candidates):
+            candidates = [index for _, index in rarest]
+        hits = []
+        for index in candidates:
+            rank = self.rank(index, query)
+            if rank is not None:
+                hits.append((rank, index))
+        hits.sort()
+        return hits
+
+
+class WordIndex:
+    """Ranked search over the words of several levels
+
+    add_level() may be called from loader threads.  search() returns
+    (level, index) pairs ordered by rank, then level order, then position.
+    """
+
+    def __init__(self, levels):
+        self.levels = list(levels)  # Result order across levels
+        self.indexes = {}  # level -> LevelIndex
+        self.lock = threading.Lock()
+        self._last = None  # (query, {level: hit indices}) of the previous search
+
+    def add_level(self, level, words):
+        index = LevelIndex(words)
+        with self.lock:
+            self.indexes[level] = index
+            self._last = None
+
+    def has_level(self, level):
+        return level in self.indexes
+
+    def word(self, level, index):
+        """(russian, english) of a search hit"""
+        return self.indexes[level].words[index]
+
+    def search(self, query, levels=None, limit=None):
+        """Ranked [(level, index)] of words whose Russian or English matches query"""
+        query = fold(query)
+        if not query:
+            return []
+        with self.lock:
+            indexes = [(order, level, self.indexes[level]) for order, level in enumerate(self.levels)
+                       if level in self.indexes and (levels is None or level in levels)]
+            last = self._last
+
+        previous = last[1] if last is not None and query.startswith(last[0]) else {}
+        results = []
+        hits_by_level = {}
+        for order, level, index in indexes:
+            hits = index.search(query, previous.get(level))
+            hits_by_level[level] = [i for _, i in hits]
+            results.append([(rank, order, i, level) for rank, i in hits])
+        with self.lock:
+            if all(self.indexes.get(level) is index for _, level, index in indexes):
+                self._last = (query, hits_by_level)
+
+        merged = heapq.merge(*results)
+        if limit is not None:
+            merged = (hit for hit, _ in zip(merged, range(limit)))
+        return [(level, i) for _, _, i, level in merged]